@@ -0,0 +1,193 @@
+import argparse
+import logging
+import mmap
+import os
+import re
+import struct
+import threading
+import zlib
+from collections.abc import Iterator
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+_ENTRY = struct.Struct("<QI")  # offset, compressed length (0 = not archived)
+_SEGMENT_NAME = re.compile(r"^(\d{12})\.seg$")
+
+REPLAY_BATCH_SIZE = 500
+
+
+class _Segment:
+    # One run of `size` consecutive sequences: compressed payloads appended
+    # to <base>.seg, and a fixed-size <base>.idx with one entry per sequence
+    # at slot (sequence_id - base), so a lookup is a single mmap read.
+
+    def __init__(self, directory: Path, base: int, size: int, writable: bool):
+        self.base = base
+        self.size = size
+        data_path = directory / f"{base:012d}.seg"
+        index_path = directory / f"{base:012d}.idx"
+        flags = os.O_RDWR | os.O_CREAT if writable else os.O_RDONLY
+        self.data_fd = os.open(data_path, flags | getattr(os, "O_BINARY", 0), 0o644)
+        self.index_fd = os.open(index_path, flags | getattr(os, "O_BINARY", 0), 0o644)
+        if writable and os.fstat(self.index_fd).st_size < size * _ENTRY.size:
+            os.ftruncate(self.index_fd, size * _ENTRY.size)
+        access = mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ
+        self.index = mmap.mmap(self.index_fd, size * _ENTRY.size, access=access)
+
+    def entry(self, sequence_id: int) -> tuple[int, int]:
+        return _ENTRY.unpack_from(self.index, (sequence_id - self.base) * _ENTRY.size)
+
+    def read(self, sequence_id: int) -> bytes | None:
+        offset, length = self.entry(sequence_id)
+        if not length:
+            return None
+        return zlib.decompress(os.pread(self.data_fd, length, offset))
+
+    def append(self, sequence_id: int, compressed: bytes) -> None:
+        # Data first, index entry last: a reader never sees an entry whose
+        # bytes are not there yet.
+        offset = os.lseek(self.data_fd, 0, os.SEEK_END)
+        os.write(self.data_fd, compressed)
+        _ENTRY.pack_into(self.index, (sequence_id - self.base) * _ENTRY.size, offset, len(compressed))
+
+    def present(self) -> Iterator[int]:
+        for slot, (_, length) in enumerate(_ENTRY.iter_unpack(self.index)):
+            if length:
+                yield self.base + slot
+
+    def close(self) -> None:
+        self.index.close()
+        os.close(self.index_fd)
+        os.close(self.data_fd)
+
+
+class SegmentArchive:
+    """Append-only store of raw R2Z2 payloads keyed by sequence ID."""
+
+    SEGMENT_SIZE = 100_000
+
+    def __init__(self, directory: str | Path, writable: bool = True, level: int = 6):
+        self.directory = Path(directory)
+        self.writable = writable
+        self.level = level
+        if writable:
+            self.directory.mkdir(parents=True, exist_ok=True)
+        self._segments: dict[int, _Segment] = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "SegmentArchive":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            for segment in self._segments.values():
+                segment.close()
+            self._segments.clear()
+
+    def _segment(self, sequence_id: int, create: bool) -> _Segment | None:
+        base = sequence_id - sequence_id % self.SEGMENT_SIZE
+        segment = self._segments.get(base)
+        if segment is None:
+            if not create and not (self.directory / f"{base:012d}.seg").exists():
+                return None
+            segment = _Segment(self.directory, base, self.SEGMENT_SIZE, self.writable)
+            self._segments[base] = segment
+        return segment
+
+    def append(self, sequence_id: int, payload: bytes) -> bool:
+        compressed = zlib.compress(payload, self.level)
+        with self._lock:
+            segment = self._segment(sequence_id, create=True)
+            if segment.entry(sequence_id)[1]:
+                return False
+            segment.append(sequence_id, compressed)
+            return True
+
+    def get(self, sequence_id: int) -> bytes | None:
+        with self._lock:
+            segment = self._segment(sequence_id, create=False)
+        return segment.read(sequence_id) if segment is not None else None
+
+    def bases(self) -> list[int]:
+        if not self.directory.exists():
+            return []
+        return sorted(
+            int(m.group(1)) for m in map(_SEGMENT_NAME.match, os.listdir(self.directory)) if m
+        )
+
+    def sequences(self, start: int | None = None, end: int | None = None) -> Iterator[int]:
+        """Archived sequence IDs in [start, end), ascending."""
+        for base in self.bases():
+            if end is not None and base >= end:
+                return
+            if start is not None and base + self.SEGMENT_SIZE <= start:
+                continue
+            with self._lock:
+                segment = self._segment(base, create=False)
+            for sequence_id in segment.present():
+                if start is not None and sequence_id < start:
+                    continue
+                if end is not None and sequence_id >= end:
+                    return
+                yield sequence_id
+
+
+def main() -> None:
+    from config import settings
+    from database import SessionLocal
+    from poller import ZKillboardR2Z2
+    from poller_filters import build_pipeline
+    from repository import KillmailRepository
+
+    parser = argparse.ArgumentParser(description="Replay archived R2Z2 payloads [start, end)")
+    parser.add_argument("start", type=int, nargs="?")
+    parser.add_argument("end", type=int, nargs="?")
+    parser.add_argument("--archive", default=settings.archive_dir)
+    parser.add_argument("--all", action="store_true", help="ignore the poller filters")
+    parser.add_argument("--dry-run", action="store_true", help="count matches without saving")
+    args = parser.parse_args()
+    if not args.archive:
+        parser.error("no archive directory (--archive or ARCHIVE_DIR)")
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s [%(name)s] %(message)s",
+    )
+
+    batch: list[dict] = []
+    matched = 0
+    saved = 0
+
+    def on_killmail(killmail: dict, sequence_id: int) -> None:
+        nonlocal matched
+        matched += 1
+        if not args.dry_run:
+            batch.append(killmail)
+            if len(batch) >= REPLAY_BATCH_SIZE:
+                flush()
+
+    def flush() -> None:
+        nonlocal saved
+        if batch:
+            with SessionLocal() as db:
+                saved += KillmailRepository(db).save_many(batch)
+            batch.clear()
+
+    with SegmentArchive(args.archive, writable=False) as archive:
+        zkill = ZKillboardR2Z2(
+            filters=None if args.all else build_pipeline().compile(adaptive=True),
+            archive=archive,
+        )
+        try:
+            zkill.replay(on_killmail, start=args.start, end=args.end, flush=flush)
+        finally:
+            zkill.close()
+    logger.info("Replay finished: %d matched, %d saved", matched, saved)
+
+
+if __name__ == "__main__":
+    main()
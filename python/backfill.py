@@ -0,0 +1,151 @@
+import argparse
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+import httpx
+from sqlalchemy.orm import Session, sessionmaker
+
+from filters import CompiledPipeline, FilterPipeline
+from poller import RateLimiter, ZKillboardR2Z2
+from repository import KillmailRepository
+
+logger = logging.getLogger(__name__)
+
+
+class Backfill:
+    # Chunks are aligned to multiples of CHUNK_SIZE so re-running the same
+    # (or an overlapping) range finds the progress rows of earlier runs.
+    CHUNK_SIZE = 500
+    BATCH_SIZE = 50
+
+    def __init__(
+        self,
+        session_factory: sessionmaker[Session],
+        filters: FilterPipeline | CompiledPipeline | None = None,
+        workers: int = 4,
+        client: httpx.Client | None = None,
+        rate_limiter: RateLimiter | None = None,
+        shutdown_event: threading.Event | None = None,
+        on_accept: Callable[[dict], object] | None = None,
+    ):
+        self.session_factory = session_factory
+        # Called from the worker threads with each killmail once it is saved.
+        self.on_accept = on_accept
+        self.filters = filters
+        self.workers = max(1, workers)
+        self.shutdown_event = shutdown_event or threading.Event()
+        self.zkill = ZKillboardR2Z2(
+            client=client,
+            rate_limiter=rate_limiter,
+            shutdown_event=self.shutdown_event,
+        )
+
+    def chunks(self, start: int, end: int) -> list[tuple[int, int]]:
+        first = start - start % self.CHUNK_SIZE
+        return [
+            (max(lo, start), min(lo + self.CHUNK_SIZE, end))
+            for lo in range(first, end, self.CHUNK_SIZE)
+        ]
+
+    def clamp(self, end: int) -> int:
+        # Sequences past the head would 404 and be recorded as done.
+        return min(end, self.zkill.get_current_sequence() + 1)
+
+    def run(self, start: int, end: int, clamped: bool = False) -> int:
+        if not clamped:
+            end = self.clamp(end)
+        chunks = self.chunks(start, end)
+        logger.info("Backfill [%d, %d): %d chunks, %d workers", start, end, len(chunks), self.workers)
+        try:
+            with ThreadPoolExecutor(self.workers, thread_name_prefix="r2z2-backfill") as pool:
+                try:
+                    saved = sum(pool.map(self._run_chunk, chunks))
+                except BaseException:
+                    self.shutdown_event.set()
+                    raise
+        finally:
+            self.zkill.close()
+        logger.info("Backfill [%d, %d) finished: %d saved", start, end, saved)
+        return saved
+
+    def _run_chunk(self, chunk: tuple[int, int]) -> int:
+        start, end = chunk
+        name = f"backfill:{start}-{end}"
+        saved = 0
+        with self.session_factory() as db:
+            repo = KillmailRepository(db)
+            sequence_id = max(start, repo.load_checkpoint(name) + 1)
+            if sequence_id >= end:
+                return 0
+
+            batch: list[dict] = []
+            missing = 0
+            while sequence_id < end and not self.shutdown_event.is_set():
+                killmail = self.zkill.get_killmail(sequence_id)
+                if killmail is None:
+                    missing += 1
+                elif self.filters is None or self.filters.evaluate(killmail):
+                    batch.append(killmail)
+                if len(batch) >= self.BATCH_SIZE:
+                    saved += repo.save_many(batch, checkpoint=(name, sequence_id))
+                    self._accepted(batch)
+                    batch = []
+                sequence_id += 1
+
+            # Progress is stored with the killmails, so an interrupted chunk
+            # resumes right after the last sequence it persisted.
+            if sequence_id > start:
+                saved += repo.save_many(batch, checkpoint=(name, sequence_id - 1))
+                self._accepted(batch)
+
+        logger.info("Backfill chunk [%d, %d): %d saved, %d missing", start, end, saved, missing)
+        return saved
+
+    def _accepted(self, batch: list[dict]) -> None:
+        if self.on_accept is None:
+            return
+        for killmail in batch:
+            try:
+                self.on_accept(killmail)
+            except Exception:
+                logger.exception("on_accept failed for killmail %s", killmail.get("killmail_id"))
+
+
+def main() -> None:
+    from config import settings
+    from database import SessionLocal
+    from poller_filters import build_pipeline
+
+    parser = argparse.ArgumentParser(description="Backfill an R2Z2 sequence range [start, end)")
+    parser.add_argument("start", type=int)
+    parser.add_argument("end", type=int)
+    parser.add_argument("--workers", type=int, default=settings.backfill_workers)
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=settings.poller_rate_limit,
+        help="req/s budget for this process; leave headroom if a live poller shares the IP",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s [%(name)s] %(message)s",
+    )
+
+    backfill = Backfill(
+        SessionLocal,
+        filters=build_pipeline().compile(adaptive=True),
+        workers=args.workers,
+        rate_limiter=RateLimiter(args.rate),
+    )
+    try:
+        backfill.run(args.start, args.end)
+    except KeyboardInterrupt:
+        logger.info("Backfill interrupted; re-run the same range to resume")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bench.synthetic import fleet_fight, killmail
+
+
+class FakeR2Z2:
+    """Local stand-in for the R2Z2 endpoint, served from a background thread.
+
+    Sequences [start, start + count) exist. With `arrival_rate` they appear
+    at that many per second instead of all at once, so the client sees the
+    same 404 tail it would at the live head. `latency`/`jitter` delay every
+    response, `p429` is the share of requests answered 429, and
+    `fleet_ratio` the share of payloads that are large fleet fights.
+    `payloads` (sequence_id -> bytes) replaces the synthetic ones, e.g. with
+    recorded payloads read from a SegmentArchive.
+    """
+
+    def __init__(
+        self,
+        start: int = 100_000_000,
+        count: int = 10_000,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        p429: float = 0.0,
+        fleet_ratio: float = 0.0,
+        arrival_rate: float = 0.0,
+        payloads: dict[int, bytes] | None = None,
+        seed: int = 0,
+    ):
+        self.start = start
+        self.count = count
+        self.latency = latency
+        self.jitter = jitter
+        self.p429 = p429
+        self.arrival_rate = arrival_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        if payloads is None:
+            # Generated up front so payload building is not part of the
+            # measured ingest time.
+            payloads = {}
+            for sequence_id in range(start, start + count):
+                rng = random.Random(seed * 1_000_003 + sequence_id)
+                km = fleet_fight(sequence_id, rng) if rng.random() < fleet_ratio else killmail(sequence_id, rng)
+                payloads[sequence_id] = json.dumps(km).encode()
+        self.payloads = payloads
+
+        self.requests = 0
+        self.not_found = 0
+        self.rate_limited = 0
+        self.served_at: dict[int, float] = {}
+        self._started = 0.0
+        self._server: ThreadingHTTPServer | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def bytes_total(self) -> int:
+        return sum(len(p) for p in self.payloads.values())
+
+    def head(self) -> int:
+        last = self.start + self.count - 1
+        if not self.arrival_rate:
+            return last
+        return min(last, self.start + int((time.monotonic() - self._started) * self.arrival_rate))
+
+    def __enter__(self) -> "FakeR2Z2":
+        self.serve()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.shutdown()
+
+    def serve(self) -> None:
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                fake._respond(self)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._started = time.monotonic()
+        threading.Thread(target=self._server.serve_forever, name="fake-r2z2", daemon=True).start()
+
+    def shutdown(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def _respond(self, request: BaseHTTPRequestHandler) -> None:
+        with self._lock:
+            self.requests += 1
+            delay = self.latency + self._rng.uniform(0, self.jitter)
+            limited = self._rng.random() < self.p429
+        if delay:
+            time.sleep(delay)
+        if limited:
+            with self._lock:
+                self.rate_limited += 1
+            return self._send(request, 429, b"")
+
+        path = request.path.rsplit("/", 1)[-1]
+        if path == "sequence.json":
+            return self._send(request, 200, json.dumps({"sequence_id": self.head()}).encode())
+        try:
+            sequence_id = int(path.removesuffix(".json"))
+        except ValueError:
+            sequence_id = -1
+        payload = self.payloads.get(sequence_id) if sequence_id <= self.head() else None
+        if payload is None:
+            with self._lock:
+                self.not_found += 1
+            return self._send(request, 404, b"")
+        self.served_at.setdefault(sequence_id, time.monotonic())
+        self._send(request, 200, payload)
+
+    @staticmethod
+    def _send(request: BaseHTTPRequestHandler, status: int, body: bytes) -> None:
+        request.send_response(status)
+        request.send_header("Content-Type", "application/json")
+        request.send_header("Content-Length", str(len(body)))
+        request.end_headers()
+        request.wfile.write(body)
@@ -0,0 +1,376 @@
+"""End-to-end ingest benchmark.
+
+Runs the ingest path against a local FakeR2Z2 server and reports kills/s,
+per-kill latency (served -> committed), database round trips per kill and
+peak RSS. `--mode pipeline` (the default) is the production path:
+IngestPipeline with AsyncZKillboardR2Z2 and its writer threads.
+`--mode sync` drives ZKillboardR2Z2.poll with an inline flush, as the
+backfill does. The thresholds turn it into a regression gate: the exit
+status is 1 when any of them is missed.
+
+    python -m bench.ingest_bench --count 5000 --fleet 0.01 --json
+    python -m bench.ingest_bench --db mysql --min-kills-per-second 400
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import resource
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from sqlalchemy import event
+
+from archive import SegmentArchive
+from bench.fake_r2z2 import FakeR2Z2
+from checkpoint import FileCheckpointStore
+from filters import CompiledPipeline, FilterPipeline
+from filters.level1 import NpcFilter
+from ingest import IngestPipeline
+from poller import AsyncZKillboardR2Z2, RateLimiter, ZKillboardR2Z2
+from repository import KillmailRepository
+
+logger = logging.getLogger(__name__)
+
+
+class _StandInResult:
+    def __init__(self, rows: list[tuple] = (), rowcount: int = 0):
+        self._rows = list(rows)
+        self.rowcount = rowcount
+
+    def __iter__(self):
+        return iter(self._rows)
+
+    def first(self):
+        return self._rows[0] if self._rows else None
+
+    def scalar(self):
+        return self._rows[0][0] if self._rows else None
+
+
+class StandInDatabase:
+    """Embedded stand-in for a MySQL database.
+
+    Every statement and commit counts as one round trip and the repository
+    builds all of its parameters as usual, so the numbers cover the client
+    side of a save; server time is not modelled. Queries return no rows and
+    writes report every row as affected, so each killmail is stored as new.
+    """
+
+    def __init__(self):
+        self.statements = 0
+        self.commits = 0
+        self._lock = threading.Lock()
+
+    def session(self) -> "StandInSession":
+        return StandInSession(self)
+
+    def round_trips(self) -> int:
+        return self.statements + self.commits
+
+
+class StandInSession:
+    def __init__(self, database: StandInDatabase):
+        self.database = database
+
+    def __enter__(self) -> "StandInSession":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def execute(self, statement, params=None) -> _StandInResult:
+        with self.database._lock:
+            self.database.statements += 1
+        return _StandInResult(rowcount=len(params) if isinstance(params, list) else 1)
+
+    def commit(self) -> None:
+        with self.database._lock:
+            self.database.commits += 1
+
+    def rollback(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+def _mysql_sessions():
+    from database import SessionLocal, engine
+
+    counts = {"statements": 0, "commits": 0}
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _statement(*args):
+        counts["statements"] += 1
+
+    @event.listens_for(engine, "commit")
+    def _commit(*args):
+        counts["commits"] += 1
+
+    return SessionLocal, lambda: counts["statements"] + counts["commits"]
+
+
+def _standin_sessions():
+    database = StandInDatabase()
+    return database.session, database.round_trips
+
+
+def _recorded(directory: str, start: int, count: int) -> dict[int, bytes]:
+    # Renumbered so the server sees a contiguous run, whatever gaps the
+    # archive has.
+    payloads = {}
+    with SegmentArchive(directory, writable=False) as archive:
+        for sequence_id in archive.sequences():
+            if len(payloads) == count:
+                break
+            payloads[start + len(payloads)] = archive.get(sequence_id)
+    return payloads
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def _peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def _poll(args, server: FakeR2Z2, end: int, sessions, filters: CompiledPipeline, state: Path):
+    batch: list[tuple[dict, int]] = []
+    stored_at: dict[int, float] = {}
+    saved = 0
+
+    def on_killmail(killmail: dict, sequence_id: int) -> None:
+        batch.append((killmail, sequence_id))
+        if len(batch) >= args.batch_size:
+            flush()
+
+    def flush() -> None:
+        nonlocal saved
+        if batch:
+            with sessions() as db:
+                saved += KillmailRepository(db).save_many([k for k, _ in batch])
+            now = time.monotonic()
+            for _, sequence_id in batch:
+                stored_at[sequence_id] = now
+            batch.clear()
+
+    zkill = ZKillboardR2Z2(
+        filters=filters,
+        rate_limiter=RateLimiter(args.rate, burst=args.prefetch),
+        prefetch=args.prefetch,
+        checkpoint=FileCheckpointStore(state, every=args.batch_size),
+    )
+    zkill.BASE_URL = server.url
+    zkill.client.base_url = server.url
+    zkill.SLEEP_ON_SUCCESS = 0
+    zkill.SLEEP_ON_404 = args.sleep_on_404
+    zkill.SLEEP_ON_429 = args.sleep_on_429
+
+    def watch() -> None:
+        while zkill.last_sequence_id < end and not zkill.shutdown_event.wait(0.01):
+            pass
+        zkill.shutdown_event.set()
+
+    watcher = threading.Thread(target=watch, daemon=True)
+    watcher.start()
+    try:
+        zkill.poll(on_killmail, start_from=args.start, flush=flush)
+    finally:
+        zkill.shutdown_event.set()
+        zkill.close()
+    return zkill.last_sequence_id, saved, stored_at
+
+
+async def _ingest(args, server: FakeR2Z2, end: int, sessions, filters: CompiledPipeline, state: Path):
+    stored_at: dict[int, float] = {}
+    saved = 0
+    lock = threading.Lock()
+
+    def save(batch: list[tuple[dict, int]], cursor: tuple[str, int] | None) -> None:
+        nonlocal saved
+        with sessions() as db:
+            count = KillmailRepository(db).save_many([k for k, _ in batch], checkpoint=cursor)
+        now = time.monotonic()
+        with lock:
+            saved += count
+            for _, sequence_id in batch:
+                stored_at[sequence_id] = now
+
+    # The pipeline resumes at its checkpoint, so start it at --start.
+    state.write_text(str(args.start))
+    zkill = AsyncZKillboardR2Z2(
+        rate_limiter=RateLimiter(args.rate, burst=args.prefetch),
+        prefetch=args.prefetch,
+        prefilter=filters,
+    )
+    zkill.client.base_url = server.url
+    zkill.SLEEP_ON_SUCCESS = 0
+    zkill.SLEEP_ON_404 = args.sleep_on_404
+    zkill.SLEEP_ON_429 = args.sleep_on_429
+    pipeline = IngestPipeline(
+        zkill,
+        filters,
+        save,
+        FileCheckpointStore(state, every=args.batch_size),
+        writers=args.writers,
+        queue_size=args.queue_size,
+        batch_size=args.batch_size,
+        batch_interval=args.batch_interval,
+    )
+    task = asyncio.create_task(pipeline.run())
+    try:
+        # Done once the last sequence is fetched and nothing is left queued.
+        while not task.done() and (zkill.last_sequence_id < end or pipeline.stats()["in_flight"]):
+            await asyncio.sleep(0.01)
+        zkill.shutdown_event.set()
+        await task
+    finally:
+        await zkill.aclose()
+    return zkill.last_sequence_id, saved, stored_at
+
+
+def run(args: argparse.Namespace) -> dict:
+    payloads = _recorded(args.archive, args.start, args.count) if args.archive else None
+    server = FakeR2Z2(
+        start=args.start,
+        count=args.count,
+        latency=args.latency_ms / 1000,
+        jitter=args.jitter_ms / 1000,
+        p429=args.p429,
+        fleet_ratio=args.fleet,
+        arrival_rate=args.arrival_rate,
+        payloads=payloads,
+        seed=args.seed,
+    )
+    end = args.start + len(server.payloads) - 1
+    sessions, round_trips = _mysql_sessions() if args.db == "mysql" else _standin_sessions()
+
+    pipeline = FilterPipeline()
+    if args.filters == "default":
+        pipeline.add_level1(NpcFilter(exclude=True))
+
+    rss_before = _peak_rss_mb()
+    with server, tempfile.TemporaryDirectory() as tmp:
+        state = Path(tmp) / "state"
+        filters = pipeline.compile(adaptive=True)
+        started = time.monotonic()
+        round_trips_before = round_trips()
+        if args.mode == "pipeline":
+            last, saved, stored_at = asyncio.run(_ingest(args, server, end, sessions, filters, state))
+        else:
+            last, saved, stored_at = _poll(args, server, end, sessions, filters, state)
+        elapsed = time.monotonic() - started
+
+    latencies = [
+        (stored_at[s] - server.served_at[s]) * 1000 for s in stored_at if s in server.served_at
+    ]
+    processed = last - args.start + 1
+    trips = round_trips() - round_trips_before
+    return {
+        "mode": args.mode,
+        "db": args.db,
+        "source": "archive" if args.archive else "synthetic",
+        "killmails": processed,
+        "saved": saved,
+        "payload_mb": server.bytes_total / 1e6,
+        "seconds": elapsed,
+        "kills_per_second": processed / elapsed,
+        "latency_p50_ms": _percentile(latencies, 50),
+        "latency_p99_ms": _percentile(latencies, 99),
+        "round_trips": trips,
+        "round_trips_per_kill": trips / max(saved, 1),
+        "requests": server.requests,
+        "not_found": server.not_found,
+        "rate_limited": server.rate_limited,
+        "rss_before_mb": rss_before,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def gate(result: dict, args: argparse.Namespace) -> list[str]:
+    failures = []
+    if args.min_kills_per_second and result["kills_per_second"] < args.min_kills_per_second:
+        failures.append(f"kills/s {result['kills_per_second']:.0f} < {args.min_kills_per_second}")
+    if args.max_p99_ms and result["latency_p99_ms"] > args.max_p99_ms:
+        failures.append(f"p99 {result['latency_p99_ms']:.1f}ms > {args.max_p99_ms}ms")
+    if args.max_round_trips and result["round_trips_per_kill"] > args.max_round_trips:
+        failures.append(
+            f"round trips/kill {result['round_trips_per_kill']:.2f} > {args.max_round_trips}"
+        )
+    if args.max_rss_mb and result["peak_rss_mb"] > args.max_rss_mb:
+        failures.append(f"peak RSS {result['peak_rss_mb']:.0f}MB > {args.max_rss_mb}MB")
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="End-to-end ingest benchmark against a fake R2Z2")
+    source = parser.add_argument_group("server")
+    source.add_argument("--count", type=int, default=2000)
+    source.add_argument("--start", type=int, default=100_000_000)
+    source.add_argument("--latency-ms", type=float, default=0)
+    source.add_argument("--jitter-ms", type=float, default=0)
+    source.add_argument("--p429", type=float, default=0, help="share of requests answered 429")
+    source.add_argument("--fleet", type=float, default=0.01, help="share of fleet-fight payloads")
+    source.add_argument(
+        "--arrival-rate", type=float, default=0,
+        help="sequences published per second (0: all available up front)",
+    )
+    source.add_argument("--archive", help="serve recorded payloads from this archive directory")
+    source.add_argument("--seed", type=int, default=0)
+
+    client = parser.add_argument_group("ingest")
+    client.add_argument(
+        "--mode", choices=["pipeline", "sync"], default="pipeline",
+        help="IngestPipeline with the async poller, or the sync poller with an inline flush",
+    )
+    client.add_argument("--db", choices=["standin", "mysql"], default="standin")
+    client.add_argument("--filters", choices=["none", "default"], default="default")
+    client.add_argument("--prefetch", type=int, default=8)
+    client.add_argument("--rate", type=float, default=10_000, help="client rate limit (requests/s)")
+    client.add_argument("--batch-size", type=int, default=50)
+    client.add_argument("--batch-interval", type=float, default=2.0, help="pipeline mode")
+    client.add_argument("--writers", type=int, default=2, help="pipeline mode")
+    client.add_argument("--queue-size", type=int, default=1000, help="pipeline mode")
+    client.add_argument("--sleep-on-404", type=float, default=0.05)
+    client.add_argument("--sleep-on-429", type=float, default=0.01)
+
+    thresholds = parser.add_argument_group("regression gate")
+    thresholds.add_argument("--min-kills-per-second", type=float)
+    thresholds.add_argument("--max-p99-ms", type=float)
+    thresholds.add_argument("--max-round-trips", type=float, help="per saved kill")
+    thresholds.add_argument("--max-rss-mb", type=float)
+
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s [%(name)s] %(message)s")
+    # Injected 429s are counted in the result; one warning per retry is noise.
+    logging.getLogger("poller").setLevel(logging.ERROR)
+
+    result = run(args)
+    failures = gate(result, args)
+    result["failures"] = failures
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        for key, value in result.items():
+            if key != "failures":
+                print(f"{key:>22}  {value:.2f}" if isinstance(value, float) else f"{key:>22}  {value}")
+        for failure in failures:
+            print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
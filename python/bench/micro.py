@@ -0,0 +1,407 @@
+"""Microbenchmarks for the pure-Python hot paths.
+
+Covers each level1/level2 filter, FilterPipeline.evaluate (plain and
+compiled, sync and async, also on the poller's own filters), KillmailRepository._build_item_tree/_item_rows, and the row ->
+dict -> response mapping behind list_kills and get_kill, on synthetic
+killmails shaped by --attackers, --depth and --labels.
+
+    python -m bench.micro --json results.json
+    python -m bench.micro -k tree --depth 4 --compare results.json
+
+Each benchmark reports ops/s (best of --repeat runs), the peak memory one op
+allocates and the memory blocks it leaves behind. Results are keyed by name,
+so files from two commits can be compared with --compare.
+"""
+
+import argparse
+import gc
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Callable
+
+from sqlalchemy.engine.result import IteratorResult, SimpleResultMetaData
+
+from bench.synthetic import killmail
+from filters import FilterPipeline
+from filters.level1 import AwoxFilter, NpcFilter, SecurityFilter, SoloFilter
+from filters.level2 import (
+    AllianceFilter,
+    CharacterFilter,
+    CorporationFilter,
+    MaxValueFilter,
+    MinValueFilter,
+    RegionFilter,
+    ShipTypeFilter,
+    SolarSystemFilter,
+)
+from models import KillmailDetail, KillmailListResponse
+from poller_filters import build_pipeline
+from repository import SUMMARY_COLUMNS, KillmailRepository
+from serialization import render_kill_detail, render_kill_list
+
+POOL_SIZE = 256
+LIST_PAGE = 50
+
+# ── Fixtures ────────────────────────────────────────────────────────
+
+_DECIMAL_COLUMNS = ("zkb_fitted_value", "zkb_dropped_value", "zkb_destroyed_value", "zkb_total_value")
+
+
+def _killmail_row(km: dict) -> dict:
+    # What MySQL hands back for the killmails row: the insert parameters
+    # with DATETIME, DECIMAL and JSON columns in their driver types.
+    row = KillmailRepository._killmail_params(km)
+    row["killmail_time"] = datetime.strptime(row["killmail_time"], "%Y-%m-%dT%H:%M:%SZ")
+    row["uploaded_at"] = datetime.strptime(row["uploaded_at"], "%Y-%m-%d %H:%M:%S")
+    row["created_at"] = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+    for column in _DECIMAL_COLUMNS:
+        row[column] = Decimal(str(row[column])).quantize(Decimal("0.01"))
+    return row
+
+
+def _attacker_rows(km: dict) -> list[dict]:
+    return [
+        {"id": i + 1, **KillmailRepository._attacker_params(km["killmail_id"], a)}
+        for i, a in enumerate(km["esi"].get("attackers", []))
+    ]
+
+
+def _item_rows(km: dict) -> list[dict]:
+    # killmail_items rows as get_kill reads them: AUTO_INCREMENT ids with
+    # parent_id resolved from the insert-time parent_index.
+    rows = KillmailRepository._item_rows(km["killmail_id"], km["esi"]["victim"].get("items", []))
+    return [
+        {
+            "id": r["item_index"] + 1,
+            "parent_id": None if r["parent_index"] is None else r["parent_index"] + 1,
+            "item_type_id": r["item_type_id"],
+            "flag": r["flag"],
+            "quantity_destroyed": r["quantity_destroyed"],
+            "quantity_dropped": r["quantity_dropped"],
+            "singleton": r["singleton"],
+        }
+        for r in rows
+    ]
+
+
+def _result(rows: list[dict], columns: list[str] | None = None) -> list:
+    # Real SQLAlchemy Row objects, so _mapping and tuple() cost what they do
+    # on a live result.
+    columns = columns or list(rows[0])
+    tuples = [tuple(r[c] for c in columns) for r in rows]
+    return list(IteratorResult(SimpleResultMetaData(columns), iter(tuples)))
+
+
+class Fixtures:
+    def __init__(self, args: argparse.Namespace):
+        rng = random.Random(args.seed)
+        self.killmails = [
+            killmail(
+                1000 + i,
+                random.Random(rng.getrandbits(32)),
+                attackers=args.attackers,
+                items=args.items,
+                depth=args.depth,
+                labels=args.labels,
+            )
+            for i in range(POOL_SIZE)
+        ]
+        self.rows = [_killmail_row(km) for km in self.killmails]
+
+        self.list_page = _result(self.rows[:LIST_PAGE])
+        self.list_page_raw = _result(self.rows[:LIST_PAGE], list(SUMMARY_COLUMNS))
+
+        detail_rows = []
+        self.item_rows = []
+        for km, row in zip(self.killmails, self.rows):
+            items = _item_rows(km)
+            self.item_rows.append(items)
+            detail_rows.append({
+                **row,
+                "attackers_json": json.dumps(_attacker_rows(km)),
+                "items_json": json.dumps(items),
+            })
+        self.detail_rows = _result(detail_rows)
+
+        # Entity filters watch the IDs of one attacker, so a few kills in the
+        # pool match and the rest take the full scan.
+        sample = self.killmails[0]
+        attacker = sample["esi"]["attackers"][0]
+        self.entity_ids = {
+            "character": [attacker.get("character_id", 0)],
+            "corporation": [attacker.get("corporation_id", 0)],
+            "alliance": [attacker.get("alliance_id", 0)],
+        }
+
+
+# ── Benchmarks ──────────────────────────────────────────────────────
+
+
+class _FakeSession:
+    # Hands prepared rows to the repository in place of a database.
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.scalar_value = len(rows)
+
+    def execute(self, statement, params=None):
+        return self
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def first(self):
+        return self.rows[0]
+
+    def scalar(self):
+        return self.scalar_value
+
+
+def _cycle(items: list) -> Callable[[], object]:
+    # Walks the pool so consecutive ops do not hit the same (cached) object.
+    state = {"i": 0}
+
+    def next_item():
+        i = state["i"]
+        state["i"] = (i + 1) % len(items)
+        return items[i]
+
+    return next_item
+
+
+def _drive(coro) -> object:
+    # Runs a coroutine that never suspends without an event loop, so only
+    # the evaluation itself is timed.
+    try:
+        coro.send(None)
+    except StopIteration as stop:
+        return stop.value
+    raise RuntimeError("coroutine suspended")
+
+
+def _filters(f: Fixtures) -> dict[str, object]:
+    return {
+        "NpcFilter": NpcFilter(exclude=True),
+        "SoloFilter": SoloFilter(exclude=True),
+        "AwoxFilter": AwoxFilter(exclude=True),
+        "SecurityFilter": SecurityFilter(["nullsec", "w-space"]),
+        "MinValueFilter": MinValueFilter(10_000_000),
+        "MaxValueFilter": MaxValueFilter(10_000_000_000),
+        "ShipTypeFilter": ShipTypeFilter([587, 670]),
+        "SolarSystemFilter": SolarSystemFilter(list(range(30000000, 30001000))),
+        "RegionFilter": RegionFilter([10000002, 10000060]),
+        "CharacterFilter": CharacterFilter(f.entity_ids["character"]),
+        "CorporationFilter": CorporationFilter(f.entity_ids["corporation"]),
+        "AllianceFilter": AllianceFilter(f.entity_ids["alliance"]),
+    }
+
+
+def _pipeline(f: Fixtures) -> FilterPipeline:
+    # The poller's defaults plus an entity watch, the common subscription.
+    return (
+        FilterPipeline()
+        .add_level1(NpcFilter(exclude=True))
+        .add_level1(SecurityFilter(["lowsec", "nullsec", "w-space"]))
+        .add_level2(MinValueFilter(1_000_000))
+        .add_level2(AllianceFilter(f.entity_ids["alliance"], mode="exclude"))
+    )
+
+
+def benchmarks(f: Fixtures) -> dict[str, Callable[[], object]]:
+    killmails = _cycle(f.killmails)
+    suite: dict[str, Callable[[], object]] = {}
+
+    for name, flt in _filters(f).items():
+        suite[f"filter.{name}"] = lambda flt=flt: flt.filter(killmails())
+
+    pipeline = _pipeline(f)
+    compiled = pipeline.compile()
+    adaptive = pipeline.compile(adaptive=True)
+    suite["pipeline.evaluate"] = lambda: pipeline.evaluate(killmails())
+    suite["pipeline.compiled"] = lambda: compiled.evaluate(killmails())
+    suite["pipeline.adaptive"] = lambda: adaptive.evaluate(killmails())
+    suite["pipeline.evaluate_async"] = lambda: _drive(pipeline.evaluate_async(killmails()))
+    suite["pipeline.adaptive_async"] = lambda: _drive(adaptive.evaluate_async(killmails()))
+
+    # The POLLER_* defaults alone, as the poller, backfill and replay run them.
+    poller = build_pipeline()
+    poller_adaptive = poller.compile(adaptive=True)
+    suite["pipeline.poller.evaluate"] = lambda: poller.evaluate(killmails())
+    suite["pipeline.poller.adaptive"] = lambda: poller_adaptive.evaluate(killmails())
+    suite["pipeline.poller.adaptive_async"] = lambda: _drive(poller_adaptive.evaluate_async(killmails()))
+
+    item_rows = _cycle(f.item_rows)
+    victim_items = _cycle([(km["killmail_id"], km["esi"]["victim"]["items"]) for km in f.killmails])
+    suite["repository.build_item_tree"] = lambda: KillmailRepository._build_item_tree(item_rows())
+    suite["repository.item_rows"] = lambda: KillmailRepository._item_rows(*victim_items())
+    suite["repository.killmail_params"] = lambda: KillmailRepository._killmail_params(killmails())
+
+    list_repo = KillmailRepository(_FakeSession(f.list_page))
+    raw_repo = KillmailRepository(_FakeSession(f.list_page_raw))
+    suite["list_kills.rows"] = lambda: list_repo.list_kills(limit=LIST_PAGE)
+    suite["list_kills.pydantic"] = lambda: KillmailListResponse.model_validate(
+        list_repo.list_kills(limit=LIST_PAGE)
+    ).model_dump(mode="json")
+    suite["list_kills.fast_json"] = lambda: render_kill_list(
+        raw_repo.list_kills(limit=LIST_PAGE, raw=True), SUMMARY_COLUMNS
+    )
+
+    detail_session = _FakeSession([])
+    detail_repo = KillmailRepository(detail_session)
+    detail_rows = _cycle(f.detail_rows)
+
+    def get_kill():
+        detail_session.rows = [detail_rows()]
+        return detail_repo.get_kill(0)
+
+    suite["get_kill.rows"] = get_kill
+    suite["get_kill.pydantic"] = lambda: KillmailDetail.model_validate(get_kill()).model_dump(mode="json")
+    suite["get_kill.fast_json"] = lambda: render_kill_detail(get_kill())
+    return suite
+
+
+# ── Measurement ─────────────────────────────────────────────────────
+
+
+def _calibrate(fn: Callable[[], object], min_time: float) -> int:
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time / 5:
+            return max(1, int(number * min_time / elapsed))
+        number *= 2
+
+
+def _memory(fn: Callable[[], object], number: int) -> tuple[float, float]:
+    # Peak bytes allocated by a single op, and blocks still allocated per
+    # op after `number` ops (> 0 means something grows, e.g. a cache).
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        gc.collect()
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    gc.collect()
+    blocks = sys.getallocatedblocks()
+    for _ in range(number):
+        fn()
+    gc.collect()
+    return peak - base, (sys.getallocatedblocks() - blocks) / number
+
+
+def measure(fn: Callable[[], object], min_time: float, repeat: int) -> dict:
+    fn()  # warm up caches (compiled plans, adaptive ordering)
+    number = _calibrate(fn, min_time)
+    timings = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for _ in range(number):
+                fn()
+            timings.append((time.perf_counter() - started) / number)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    peak, retained = _memory(fn, min(number, 1000))
+    best = min(timings)
+    return {
+        "ops_per_second": 1 / best,
+        "us_per_op": best * 1e6,
+        "median_us_per_op": sorted(timings)[len(timings) // 2] * 1e6,
+        "loops": number,
+        "peak_bytes_per_op": peak,
+        "retained_blocks_per_op": retained,
+    }
+
+
+def _commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _compare(results: dict, baseline: dict) -> None:
+    print(f"\n{'benchmark':<32}{'baseline':>12}{'current':>12}{'change':>9}")
+    for name, result in results.items():
+        before = baseline.get("results", {}).get(name)
+        if before is None:
+            continue
+        change = result["ops_per_second"] / before["ops_per_second"] - 1
+        print(
+            f"{name:<32}{before['ops_per_second']:>12,.0f}{result['ops_per_second']:>12,.0f}"
+            f"{change:>+9.1%}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Microbenchmarks for filters and row mapping")
+    parser.add_argument("-k", dest="pattern", help="only run benchmarks whose name contains this")
+    parser.add_argument("--attackers", type=int, help="attackers per killmail (default: mixed)")
+    parser.add_argument("--items", type=int, help="top-level items per killmail (default: mixed)")
+    parser.add_argument("--depth", type=int, default=1, help="container nesting depth")
+    parser.add_argument("--labels", type=int, help="extra labels per killmail (default: 1-3)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per timing run")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", dest="output", help="write results to this file ('-' for stdout)")
+    parser.add_argument("--compare", help="results file from an earlier run")
+    args = parser.parse_args()
+
+    fixtures = Fixtures(args)
+    suite = {
+        name: fn for name, fn in benchmarks(fixtures).items() if not args.pattern or args.pattern in name
+    }
+
+    results = {}
+    for name, fn in suite.items():
+        results[name] = result = measure(fn, args.min_time, args.repeat)
+        if args.output != "-":
+            print(
+                f"{name:<32}{result['ops_per_second']:>12,.0f} ops/s"
+                f"{result['us_per_op']:>10.1f} us{result['peak_bytes_per_op']:>10,.0f} B/op",
+                flush=True,
+            )
+
+    report = {
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "params": {
+            k: getattr(args, k) for k in ("attackers", "items", "depth", "labels", "seed", "min_time", "repeat")
+        },
+        "results": results,
+    }
+    if args.output == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    elif args.output:
+        with open(args.output, "w") as fh:
+            json.dump(report, fh, indent=2)
+    if args.compare:
+        with open(args.compare) as fh:
+            _compare(results, json.load(fh))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import random
+from datetime import datetime, timezone
+
+# Rough shape of real R2Z2 traffic: mostly small gangs and solo kills, a
+# share of NPC kills, and the occasional fleet fight with hundreds of
+# attackers and a long cargo list.
+
+REGIONS = [10000002, 10000014, 10000060, 10000039, 10000043]
+SECURITY = ["loc:highsec", "loc:lowsec", "loc:nullsec", "loc:w-space"]
+SHIPS = [587, 11379, 17738, 24690, 29990, 33470, 37480, 670]
+LABELS = [
+    "pvp", "ganked", "padding", "capital", "isk:1b+", "isk:10b+",
+    "tz:eu", "tz:us", "tz:au", "cat:6", "cat:65", "10+", "100+", "1000+",
+]
+
+# Timestamps count from a fixed epoch (2024-01-01 UTC), one second per
+# sequence, so a payload depends on nothing but its arguments.
+EPOCH = 1_704_067_200
+
+
+def killmail(
+    sequence_id: int,
+    rng: random.Random | None = None,
+    attackers: int | None = None,
+    items: int | None = None,
+    depth: int = 1,
+    labels: int | None = 0,
+) -> dict:
+    """One R2Z2-shaped payload.
+
+    `attackers` and `items` force its size, `depth` is how deep containers
+    nest inside the victim's items, and `labels` how many labels are added
+    on top of the security/region/npc/solo ones (None: 1-3).
+    """
+    rng = rng or random.Random(sequence_id)
+    if attackers is None:
+        attackers = 1 if rng.random() < 0.3 else rng.randint(2, 25)
+    if items is None:
+        items = rng.randint(5, 40)
+    npc = rng.random() < 0.15
+    killmail_id = 120_000_000 + sequence_id
+    now = EPOCH + sequence_id
+    value = round(rng.lognormvariate(17, 1.5), 2)
+    # Extra labels come from their own generator, seeded from values already
+    # drawn, so adding them leaves the rest of the payload unchanged for a
+    # given seed (with the defaults, payloads match earlier versions).
+    label_rng = random.Random(f"{sequence_id}:{value}")
+    if labels is None:
+        labels = label_rng.randint(1, 3)
+
+    def entity() -> dict:
+        alliance = rng.randint(99000000, 99000200)
+        return {
+            "character_id": 2110000000 + rng.randint(0, 500_000),
+            "corporation_id": 98000000 + rng.randint(0, 20_000),
+            "alliance_id": alliance if rng.random() < 0.7 else None,
+        }
+
+    attacker_list = []
+    for i in range(attackers):
+        attacker = {k: v for k, v in entity().items() if v is not None}
+        attacker.update(
+            damage_done=rng.randint(0, 20_000),
+            final_blow=i == 0,
+            security_status=round(rng.uniform(-10, 5), 1),
+            ship_type_id=rng.choice(SHIPS),
+            weapon_type_id=rng.randint(2000, 3000),
+        )
+        attacker_list.append(attacker)
+
+    def item_list(count: int, level: int) -> list[dict]:
+        # 5% of fitted items are containers; nested containers are common.
+        result = []
+        for _ in range(count):
+            if level == 0:
+                item = {
+                    "item_type_id": rng.randint(1000, 60000),
+                    "flag": rng.choice([5, 11, 12, 13, 19, 20, 27, 28, 87]),
+                    "quantity_destroyed": rng.randint(0, 100),
+                    "singleton": 0,
+                }
+            else:
+                item = {"item_type_id": rng.randint(1000, 60000), "flag": 0, "quantity_dropped": 1, "singleton": 0}
+            if level < depth and rng.random() < (0.05 if level == 0 else 0.3):
+                item["items"] = item_list(rng.randint(1, 5), level + 1)
+            result.append(item)
+        return result
+
+    fitted = item_list(items, 0)
+    victim = {k: v for k, v in entity().items() if v is not None}
+    victim.update(
+        ship_type_id=rng.choice(SHIPS),
+        damage_taken=rng.randint(100, 500_000),
+        position={"x": rng.uniform(-1e12, 1e12), "y": rng.uniform(-1e11, 1e11), "z": rng.uniform(-1e12, 1e12)},
+        items=fitted,
+    )
+
+    label_list = [rng.choice(SECURITY), f"reg:{rng.choice(REGIONS)}"]
+    label_list += label_rng.sample(LABELS, min(labels, len(LABELS)))
+    if npc:
+        label_list.append("npc")
+    if attackers == 1:
+        label_list.append("solo")
+
+    return {
+        "killmail_id": killmail_id,
+        "hash": f"{rng.getrandbits(160):040x}",
+        "sequence_id": sequence_id,
+        "uploaded_at": int(now),
+        "esi": {
+            "killmail_id": killmail_id,
+            "killmail_time": datetime.fromtimestamp(now - rng.uniform(0, 600), tz=timezone.utc)
+            .strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "solar_system_id": 30000000 + rng.randint(0, 5000),
+            "victim": victim,
+            "attackers": attacker_list,
+        },
+        "zkb": {
+            "locationID": 40000000 + rng.randint(0, 100_000),
+            "hash": "",
+            "fittedValue": round(value * 0.6, 2),
+            "droppedValue": round(value * 0.3, 2),
+            "destroyedValue": round(value * 0.7, 2),
+            "totalValue": value,
+            "points": rng.randint(1, 100),
+            "npc": npc,
+            "solo": attackers == 1,
+            "awox": rng.random() < 0.01,
+            "labels": label_list,
+            "href": f"https://esi.evetech.net/v1/killmails/{killmail_id}/",
+        },
+    }
+
+
+def fleet_fight(sequence_id: int, rng: random.Random | None = None) -> dict:
+    rng = rng or random.Random(sequence_id)
+    return killmail(sequence_id, rng, attackers=rng.randint(300, 1500), items=rng.randint(100, 400))
@@ -0,0 +1,71 @@
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import Any
+
+
+class TTLCache:
+    # Small thread-safe map whose entries expire `ttl` seconds after being
+    # set; the oldest entry is evicted once `maxsize` is reached.
+
+    def __init__(self, ttl: float, maxsize: int = 1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any | None:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._data[key]
+                return None
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+            if len(self._data) >= self.maxsize:
+                self._data.popitem(last=False)
+            self._data[key] = (time.monotonic() + self.ttl, value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class ByteLRUCache:
+    # Thread-safe LRU of byte strings bounded by their total size rather
+    # than the number of entries. Values larger than `maxbytes` are not kept.
+
+    def __init__(self, maxbytes: int):
+        self.maxbytes = maxbytes
+        self.size = 0
+        self._data: OrderedDict[Hashable, tuple[bytes, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> tuple[bytes, Any] | None:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+            return entry
+
+    def set(self, key: Hashable, body: bytes, meta: Any = None) -> None:
+        if len(body) > self.maxbytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.size -= len(old[0])
+            while self._data and self.size + len(body) > self.maxbytes:
+                _, (evicted, _) = self._data.popitem(last=False)
+                self.size -= len(evicted)
+            self._data[key] = (body, meta)
+            self.size += len(body)
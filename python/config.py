@@ -1,5 +1,7 @@
 from pydantic_settings import BaseSettings
 
+from feed import SlowConsumerPolicy
+
 
 class Settings(BaseSettings):
     db_host: str = "127.0.0.1"
@@ -7,12 +9,45 @@ class Settings(BaseSettings):
     db_name: str = "zkillboard"
     db_user: str = "root"
     db_pass: str = ""
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout: float = 30
+    db_pool_recycle: int = 3600
 
     poller_enabled: bool = True
     poller_state_file: str = "zkill_sequence.txt"
     poller_exclude_npc: bool = True
     poller_security_zones: list[str] = ["nullsec", "lowsec"]
     poller_min_value: float = 10_000_000
+    poller_prefetch: int = 8
+    poller_rate_limit: float = 20
+    poller_staged_decode: bool = True
+    poller_writers: int = 2
+    poller_queue_size: int = 1000
+    poller_batch_size: int = 50
+    poller_batch_interval: float = 2.0
+    poller_checkpoint: str = "file"
+    poller_checkpoint_every: int = 100
+    poller_checkpoint_interval: float = 5.0
+    archive_dir: str | None = None
+
+    ingest_report_interval: float = 60
+    metrics_head_interval: float = 30
+
+    backfill_workers: int = 4
+
+    count_cache_ttl: float = 30
+    count_estimate_cap: int = 10_000
+
+    api_fast_json: bool = False
+    detail_cache_bytes: int = 64_000_000
+
+    feed_queue_size: int = 256
+    feed_policy: SlowConsumerPolicy = "drop_oldest"
+
+    hot_window_enabled: bool = True
+    hot_window_hours: float = 6
+    hot_window_capacity: int = 200_000
 
     @property
     def database_url(self) -> str:
@@ -22,5 +57,9 @@ class Settings(BaseSettings):
             "?charset=utf8mb4"
         )
 
+    @property
+    def async_database_url(self) -> str:
+        return self.database_url.replace("mysql+pymysql://", "mysql+aiomysql://", 1)
+
 
 settings = Settings()
@@ -1,15 +1,27 @@
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
 
 from config import settings
 
-engine = create_engine(settings.database_url, pool_recycle=3600, pool_pre_ping=True)
+_pool_options = {
+    "pool_size": settings.db_pool_size,
+    "max_overflow": settings.db_max_overflow,
+    "pool_timeout": settings.db_pool_timeout,
+    "pool_recycle": settings.db_pool_recycle,
+    "pool_pre_ping": True,
+}
+
+# Sync engine: poller writes, backfill and streaming exports.
+engine = create_engine(settings.database_url, **_pool_options)
 SessionLocal = sessionmaker(bind=engine)
 
+# Async engine: API reads, so concurrent requests wait on the pool rather
+# than on threadpool slots.
+async_engine = create_async_engine(settings.async_database_url, **_pool_options)
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
@@ -0,0 +1,124 @@
+import asyncio
+import itertools
+import logging
+from typing import Literal
+
+from filters import FilterPipeline
+from filters.subscriptions import SubscriptionRegistry
+from serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+SlowConsumerPolicy = Literal["drop_oldest", "drop_newest", "disconnect"]
+
+
+class FeedEvent:
+    __slots__ = ("killmail_id", "data")
+
+    def __init__(self, killmail_id: int, data: bytes):
+        self.killmail_id = killmail_id
+        self.data = data
+
+
+class Subscriber:
+    # Bounded queue of events for one client. When it is full the policy
+    # decides what gives: the oldest queued event, the new one, or the
+    # client itself. Publishing never waits on a subscriber.
+
+    def __init__(self, key: int, queue_size: int, policy: SlowConsumerPolicy):
+        self.key = key
+        self.policy = policy
+        self.dropped = 0
+        self.closed = False
+        self._queue: asyncio.Queue[FeedEvent | None] = asyncio.Queue(max(1, queue_size))
+
+    def offer(self, event: FeedEvent) -> bool:
+        # Returns False once the subscriber has been disconnected.
+        try:
+            self._queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            pass
+        self.dropped += 1
+        if self.policy == "disconnect":
+            logger.info("Feed subscriber %d disconnected: queue full", self.key)
+            self.close()
+            return False
+        if self.policy == "drop_oldest":
+            self._queue.get_nowait()
+            self._queue.put_nowait(event)
+        return True
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        self._queue.put_nowait(None)
+
+    async def get(self, timeout: float | None = None) -> FeedEvent | None:
+        # None means the subscriber was closed; TimeoutError means no
+        # event arrived within `timeout`.
+        if self.closed and self._queue.empty():
+            return None
+        return await asyncio.wait_for(self._queue.get(), timeout)
+
+
+class FeedHub:
+    # In-process fan-out of accepted killmails to live subscribers. Each
+    # subscriber has its own FilterPipeline, matched through a
+    # SubscriptionRegistry, and each killmail is encoded once however many
+    # subscribers receive it. Must be used from the event loop thread.
+
+    def __init__(self, queue_size: int = 256, policy: SlowConsumerPolicy = "drop_oldest"):
+        self.queue_size = queue_size
+        self.policy = policy
+        self._registry = SubscriptionRegistry()
+        self._subscribers: dict[int, Subscriber] = {}
+        self._keys = itertools.count(1)
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(
+        self,
+        pipeline: FilterPipeline,
+        queue_size: int | None = None,
+        policy: SlowConsumerPolicy | None = None,
+    ) -> Subscriber:
+        subscriber = Subscriber(
+            next(self._keys),
+            queue_size or self.queue_size,
+            policy or self.policy,
+        )
+        self._registry.add(subscriber.key, pipeline)
+        self._subscribers[subscriber.key] = subscriber
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self._registry.remove(subscriber.key)
+        self._subscribers.pop(subscriber.key, None)
+        subscriber.close()
+
+    def publish(self, killmail: dict) -> int:
+        if not self._subscribers:
+            return 0
+        keys = self._registry.match(killmail)
+        if not keys:
+            return 0
+        event = FeedEvent(killmail["killmail_id"], dumps(killmail))
+        delivered = 0
+        for key in keys:
+            subscriber = self._subscribers.get(key)
+            if subscriber is None:
+                continue
+            if subscriber.offer(event):
+                delivered += 1
+            else:
+                self.unsubscribe(subscriber)
+        return delivered
+
+    def close(self) -> None:
+        for subscriber in list(self._subscribers.values()):
+            self.unsubscribe(subscriber)
@@ -1,20 +1,86 @@
-from typing import Protocol
+import inspect
+from typing import Awaitable, Callable, Protocol
+
+# Shared default for missing sections; never mutated.
+_EMPTY: dict = {}
+
+
+class KillmailFacts:
+    # Fields the filters look at, extracted once per killmail and shared by
+    # every filter in a compiled pipeline. Kept to a few slots, since it is
+    # built for every killmail; entity sets are only built on request.
+    __slots__ = ("killmail", "zkb", "esi", "_entities")
+
+    def __init__(self, killmail: dict):
+        self.killmail = killmail
+        self.zkb = killmail.get("zkb", _EMPTY)
+        self.esi = killmail.get("esi", _EMPTY)
+        self._entities = None
+
+    @property
+    def victim(self) -> dict:
+        return self.esi.get("victim", _EMPTY)
+
+    @property
+    def labels(self) -> frozenset[str]:
+        return frozenset(self.zkb.get("labels", ()))
+
+    @property
+    def character_ids(self) -> set[int]:
+        return self._entity_ids("character_id")
+
+    @property
+    def corporation_ids(self) -> set[int]:
+        return self._entity_ids("corporation_id")
+
+    @property
+    def alliance_ids(self) -> set[int]:
+        return self._entity_ids("alliance_id")
+
+    def has_entity(self, key: str, ids: set[int]) -> bool:
+        # Whether the victim or an attacker has one of `ids` under `key`.
+        # Uses the entity set if one was built (the subscription registry
+        # builds all three), otherwise scans and stops at the first match.
+        if self._entities is not None and key in self._entities:
+            return not ids.isdisjoint(self._entities[key])
+        esi = self.esi
+        if esi.get("victim", _EMPTY).get(key) in ids:
+            return True
+        for attacker in esi.get("attackers", ()):
+            if attacker.get(key) in ids:
+                return True
+        return False
+
+    def _entity_ids(self, key: str) -> set[int]:
+        if self._entities is None:
+            self._entities = {}
+        ids = self._entities.get(key)
+        if ids is None:
+            ids = {attacker.get(key) for attacker in self.esi.get("attackers", ())}
+            ids.add(self.victim.get(key))
+            ids.discard(None)
+            self._entities[key] = ids
+        return ids
 
 
 class KillmailFilter(Protocol):
     def filter(self, killmail: dict) -> bool: ...
 
 
+class AsyncKillmailFilter(Protocol):
+    def filter(self, killmail: dict) -> Awaitable[bool]: ...
+
+
 class FilterPipeline:
     def __init__(self):
-        self._level1: list[KillmailFilter] = []
-        self._level2: list[KillmailFilter] = []
+        self._level1: list[KillmailFilter | AsyncKillmailFilter] = []
+        self._level2: list[KillmailFilter | AsyncKillmailFilter] = []
 
-    def add_level1(self, f: KillmailFilter) -> "FilterPipeline":
+    def add_level1(self, f: KillmailFilter | AsyncKillmailFilter) -> "FilterPipeline":
         self._level1.append(f)
         return self
 
-    def add_level2(self, f: KillmailFilter) -> "FilterPipeline":
+    def add_level2(self, f: KillmailFilter | AsyncKillmailFilter) -> "FilterPipeline":
         self._level2.append(f)
         return self
 
@@ -26,3 +92,168 @@ class FilterPipeline:
             if not f.filter(killmail):
                 return False
         return True
+
+    async def evaluate_async(self, killmail: dict) -> bool:
+        for f in (*self._level1, *self._level2):
+            result = f.filter(killmail)
+            if inspect.isawaitable(result):
+                result = await result
+            if not result:
+                return False
+        return True
+
+    @property
+    def filters(self) -> tuple:
+        return (*self._level1, *self._level2)
+
+    @property
+    def has_prefilter(self) -> bool:
+        return any(getattr(f, "ZKB_ONLY", False) for f in self.filters)
+
+    def prefilter(self, zkb: dict) -> bool:
+        stub = {"zkb": zkb}
+        return all(f.filter(stub) for f in self.filters if getattr(f, "ZKB_ONLY", False))
+
+    def compile(self, adaptive: bool = False) -> "CompiledPipeline":
+        return CompiledPipeline(self._level1, self._level2, adaptive=adaptive)
+
+
+class _Stage:
+    __slots__ = (
+        "filter", "level", "check", "cost", "runs", "rejections", "_counted_rejections",
+        "prefilter_runs", "prefilter_rejections",
+    )
+
+    def __init__(self, f, level: int):
+        self.filter = f
+        self.level = level
+        self.check: Callable[[KillmailFacts], bool] = (
+            f.check if hasattr(f, "check") else lambda facts: f.filter(facts.killmail)
+        )
+        self.cost = getattr(f, "COST", 1)
+        # Only rejections are counted per evaluation; runs are derived from
+        # them in CompiledPipeline._tally.
+        self.runs = 0
+        self.rejections = 0
+        self._counted_rejections = 0
+        # Counted apart from runs/rejections: a killmail that passes the
+        # prefilter is checked again in full, which would skew the score.
+        self.prefilter_runs = 0
+        self.prefilter_rejections = 0
+
+    @property
+    def score(self) -> float:
+        return (self.rejections / self.runs if self.runs else 0.0) / self.cost
+
+
+class CompiledPipeline:
+    # Evaluates every filter against one shared KillmailFacts, so zkb/esi
+    # lookups happen once per killmail, through checks that use prebuilt
+    # sets where filter() walks lists. The checks are flattened into one
+    # tuple of bound methods.
+    #
+    # With adaptive=True, filters within a level are periodically reordered
+    # so the cheapest, most selective ones run first. Evaluation only counts
+    # killmails and rejections; since the order is fixed between reorders,
+    # how many killmails reached each filter follows from those. The
+    # counters are plain attribute increments without a lock: when several
+    # threads share a pipeline (backfill workers) some increments are lost,
+    # which only makes the ordering slightly less informed.
+    REORDER_EVERY = 1000
+
+    def __init__(self, level1: list, level2: list, adaptive: bool = False):
+        self._stages = (*(_Stage(f, 1) for f in level1), *(_Stage(f, 2) for f in level2))
+        self._checks = tuple(stage.check for stage in self._stages)
+        self._zkb_stages = [stage for stage in self._stages if getattr(stage.filter, "ZKB_ONLY", False)]
+        self.adaptive = adaptive
+        self._evaluated = 0
+        self._tallied = 0
+
+    @property
+    def has_prefilter(self) -> bool:
+        return bool(self._zkb_stages)
+
+    def prefilter(self, zkb: dict) -> bool:
+        # Runs the filters that only read zkb, before the esi body is decoded.
+        facts = KillmailFacts({"zkb": zkb})
+        for stage in self._zkb_stages:
+            stage.prefilter_runs += 1
+            if not stage.check(facts):
+                stage.prefilter_rejections += 1
+                return False
+        return True
+
+    def evaluate(self, killmail: dict) -> bool:
+        return self.evaluate_facts(KillmailFacts(killmail))
+
+    def evaluate_facts(self, facts: KillmailFacts) -> bool:
+        if not self.adaptive:
+            for check in self._checks:
+                if not check(facts):
+                    return False
+            return True
+        # Reorder before counting this killmail, so the tally never includes
+        # one whose rejection is not recorded yet.
+        if self._evaluated % self.REORDER_EVERY == 0:
+            self._reorder()
+        self._evaluated += 1
+        for stage in self._stages:
+            if not stage.check(facts):
+                stage.rejections += 1
+                return False
+        return True
+
+    async def evaluate_async(self, killmail: dict) -> bool:
+        # Same as evaluate(), awaiting the filters that are async.
+        facts = KillmailFacts(killmail)
+        adaptive = self.adaptive
+        if adaptive:
+            if self._evaluated % self.REORDER_EVERY == 0:
+                self._reorder()
+            self._evaluated += 1
+        for stage in self._stages:
+            result = stage.check(facts)
+            # inspect.isawaitable is slow next to the checks themselves.
+            if result is not True and result is not False and inspect.isawaitable(result):
+                result = await result
+            if not result:
+                if adaptive:
+                    stage.rejections += 1
+                return False
+        return True
+
+    def stage_counts(self) -> list[dict]:
+        # Evaluation and rejection counts per filter. Full evaluations are
+        # only counted with adaptive=True; exact when one thread evaluates,
+        # approximate when several share the pipeline.
+        self._tally()
+        return [
+            {
+                "level": stage.level,
+                "filter": type(stage.filter).__name__,
+                "runs": stage.runs,
+                "rejections": stage.rejections,
+                "prefilter_runs": stage.prefilter_runs,
+                "prefilter_rejections": stage.prefilter_rejections,
+            }
+            for stage in sorted(self._stages, key=lambda s: s.level)
+        ]
+
+    def _tally(self) -> None:
+        # Adds the runs since the last tally: every killmail evaluated since
+        # then reached the first filter, and each filter passed on all but
+        # the ones it rejected.
+        evaluated = self._evaluated
+        reached = max(0, evaluated - self._tallied)
+        self._tallied = evaluated
+        for stage in self._stages:
+            stage.runs += reached
+            rejections = stage.rejections
+            reached = max(0, reached - (rejections - stage._counted_rejections))
+            stage._counted_rejections = rejections
+
+    def _reorder(self) -> None:
+        # Replace rather than sort in place: other threads may be iterating.
+        self._tally()
+        self._stages = tuple(sorted(self._stages, key=lambda s: (s.level, -s.score)))
+        self._checks = tuple(stage.check for stage in self._stages)
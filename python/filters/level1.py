@@ -1,4 +1,10 @@
+from filters import KillmailFacts
+
+
 class NpcFilter:
+    COST = 1
+    ZKB_ONLY = True
+
     def __init__(self, exclude: bool = False):
         self.exclude = exclude
 
@@ -6,8 +12,15 @@ class NpcFilter:
         is_npc = bool(killmail.get("zkb", {}).get("npc", False))
         return not is_npc if self.exclude else is_npc
 
+    def check(self, facts: KillmailFacts) -> bool:
+        is_npc = bool(facts.zkb.get("npc", False))
+        return not is_npc if self.exclude else is_npc
+
 
 class SoloFilter:
+    COST = 1
+    ZKB_ONLY = True
+
     def __init__(self, exclude: bool = False):
         self.exclude = exclude
 
@@ -15,8 +28,15 @@ class SoloFilter:
         is_solo = bool(killmail.get("zkb", {}).get("solo", False))
         return not is_solo if self.exclude else is_solo
 
+    def check(self, facts: KillmailFacts) -> bool:
+        is_solo = bool(facts.zkb.get("solo", False))
+        return not is_solo if self.exclude else is_solo
+
 
 class AwoxFilter:
+    COST = 1
+    ZKB_ONLY = True
+
     def __init__(self, exclude: bool = False):
         self.exclude = exclude
 
@@ -24,11 +44,22 @@ class AwoxFilter:
         is_awox = bool(killmail.get("zkb", {}).get("awox", False))
         return not is_awox if self.exclude else is_awox
 
+    def check(self, facts: KillmailFacts) -> bool:
+        is_awox = bool(facts.zkb.get("awox", False))
+        return not is_awox if self.exclude else is_awox
+
 
 class SecurityFilter:
+    COST = 2
+    ZKB_ONLY = True
+
     def __init__(self, allow: list[str]):
         self.allow = [f"loc:{z.removeprefix('loc:')}" for z in allow]
+        self._allowed = frozenset(self.allow)
 
     def filter(self, killmail: dict) -> bool:
         labels = killmail.get("zkb", {}).get("labels", [])
         return any(label in self.allow for label in labels)
+
+    def check(self, facts: KillmailFacts) -> bool:
+        return not self._allowed.isdisjoint(facts.zkb.get("labels", ()))
@@ -1,20 +1,37 @@
+from filters import KillmailFacts
+
+
 class MinValueFilter:
+    COST = 1
+    ZKB_ONLY = True
+
     def __init__(self, min_value: float):
         self.min_value = min_value
 
     def filter(self, killmail: dict) -> bool:
         return killmail.get("zkb", {}).get("totalValue", 0) >= self.min_value
 
+    def check(self, facts: KillmailFacts) -> bool:
+        return facts.zkb.get("totalValue", 0) >= self.min_value
+
 
 class MaxValueFilter:
+    COST = 1
+    ZKB_ONLY = True
+
     def __init__(self, max_value: float):
         self.max_value = max_value
 
     def filter(self, killmail: dict) -> bool:
         return killmail.get("zkb", {}).get("totalValue", 0) <= self.max_value
 
+    def check(self, facts: KillmailFacts) -> bool:
+        return facts.zkb.get("totalValue", 0) <= self.max_value
+
 
 class ShipTypeFilter:
+    COST = 1
+
     def __init__(self, type_ids: list[int], mode: str = "include"):
         self.type_ids = set(type_ids)
         self.mode = mode
@@ -24,8 +41,14 @@ class ShipTypeFilter:
         match = ship_type_id in self.type_ids
         return match if self.mode == "include" else not match
 
+    def check(self, facts: KillmailFacts) -> bool:
+        match = facts.victim.get("ship_type_id") in self.type_ids
+        return match if self.mode == "include" else not match
+
 
 class CharacterFilter:
+    COST = 4
+
     def __init__(self, character_ids: list[int], mode: str = "include"):
         self.character_ids = set(character_ids)
         self.mode = mode
@@ -43,8 +66,14 @@ class CharacterFilter:
                 return True
         return False
 
+    def check(self, facts: KillmailFacts) -> bool:
+        match = facts.has_entity("character_id", self.character_ids)
+        return match if self.mode == "include" else not match
+
 
 class CorporationFilter:
+    COST = 4
+
     def __init__(self, corporation_ids: list[int], mode: str = "include"):
         self.corporation_ids = set(corporation_ids)
         self.mode = mode
@@ -62,8 +91,14 @@ class CorporationFilter:
                 return True
         return False
 
+    def check(self, facts: KillmailFacts) -> bool:
+        match = facts.has_entity("corporation_id", self.corporation_ids)
+        return match if self.mode == "include" else not match
+
 
 class AllianceFilter:
+    COST = 4
+
     def __init__(self, alliance_ids: list[int], mode: str = "include"):
         self.alliance_ids = set(alliance_ids)
         self.mode = mode
@@ -81,8 +116,14 @@ class AllianceFilter:
                 return True
         return False
 
+    def check(self, facts: KillmailFacts) -> bool:
+        match = facts.has_entity("alliance_id", self.alliance_ids)
+        return match if self.mode == "include" else not match
+
 
 class SolarSystemFilter:
+    COST = 1
+
     def __init__(self, system_ids: list[int], mode: str = "include"):
         self.system_ids = set(system_ids)
         self.mode = mode
@@ -92,8 +133,15 @@ class SolarSystemFilter:
         match = system_id in self.system_ids
         return match if self.mode == "include" else not match
 
+    def check(self, facts: KillmailFacts) -> bool:
+        match = facts.esi.get("solar_system_id") in self.system_ids
+        return match if self.mode == "include" else not match
+
 
 class RegionFilter:
+    COST = 2
+    ZKB_ONLY = True
+
     def __init__(self, region_ids: list[int], mode: str = "include"):
         self.region_labels = {f"reg:{rid}" for rid in region_ids}
         self.mode = mode
@@ -102,3 +150,7 @@ class RegionFilter:
         labels = set(killmail.get("zkb", {}).get("labels", []))
         match = bool(labels & self.region_labels)
         return match if self.mode == "include" else not match
+
+    def check(self, facts: KillmailFacts) -> bool:
+        match = not self.region_labels.isdisjoint(facts.zkb.get("labels", ()))
+        return match if self.mode == "include" else not match
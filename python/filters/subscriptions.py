@@ -0,0 +1,110 @@
+import threading
+from collections import defaultdict
+from collections.abc import Hashable, Iterator
+
+from filters import CompiledPipeline, FilterPipeline, KillmailFacts
+from filters.level1 import SecurityFilter
+from filters.level2 import (
+    AllianceFilter,
+    CharacterFilter,
+    CorporationFilter,
+    RegionFilter,
+    ShipTypeFilter,
+    SolarSystemFilter,
+)
+
+# Include-mode filters whose IDs can anchor a subscription in the index,
+# most selective first.
+_ANCHORS = (
+    (CharacterFilter, "character", lambda f: f.character_ids),
+    (CorporationFilter, "corporation", lambda f: f.corporation_ids),
+    (AllianceFilter, "alliance", lambda f: f.alliance_ids),
+    (ShipTypeFilter, "ship", lambda f: f.type_ids),
+    (SolarSystemFilter, "system", lambda f: f.system_ids),
+    (RegionFilter, "label", lambda f: f.region_labels),
+    (SecurityFilter, "label", lambda f: f.allow),
+)
+
+
+def _anchor_keys(pipeline: FilterPipeline) -> list[tuple] | None:
+    best = None
+    for f in pipeline.filters:
+        if getattr(f, "mode", "include") != "include":
+            continue
+        for rank, (cls, kind, ids) in enumerate(_ANCHORS):
+            if isinstance(f, cls):
+                keys = [(kind, i) for i in ids(f)]
+                if best is None or (rank, len(keys)) < best[0]:
+                    best = ((rank, len(keys)), keys)
+                break
+    return best[1] if best else None
+
+
+def _killmail_keys(facts: KillmailFacts) -> Iterator[tuple]:
+    for character_id in facts.character_ids:
+        yield "character", character_id
+    for corporation_id in facts.corporation_ids:
+        yield "corporation", corporation_id
+    for alliance_id in facts.alliance_ids:
+        yield "alliance", alliance_id
+    yield "ship", facts.victim.get("ship_type_id")
+    yield "system", facts.esi.get("solar_system_id")
+    for label in facts.labels:
+        yield "label", label
+
+
+class SubscriptionRegistry:
+    # Routes a killmail to every subscription whose pipeline accepts it.
+    # Each subscription is indexed under the IDs of one include-mode filter
+    # (a necessary condition), so matching only evaluates subscriptions that
+    # share an entity with the killmail plus those with nothing to index.
+
+    def __init__(self):
+        self._pipelines: dict[Hashable, CompiledPipeline] = {}
+        self._keys: dict[Hashable, list[tuple] | None] = {}
+        self._index: dict[tuple, set[Hashable]] = defaultdict(set)
+        self._unindexed: set[Hashable] = set()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._pipelines)
+
+    def add(self, key: Hashable, pipeline: FilterPipeline) -> None:
+        keys = _anchor_keys(pipeline)
+        with self._lock:
+            self._remove(key)
+            self._pipelines[key] = pipeline.compile()
+            self._keys[key] = keys
+            if keys is None:
+                self._unindexed.add(key)
+            else:
+                for index_key in keys:
+                    self._index[index_key].add(key)
+
+    def remove(self, key: Hashable) -> None:
+        with self._lock:
+            self._remove(key)
+
+    def match(self, killmail: dict) -> list[Hashable]:
+        facts = KillmailFacts(killmail)
+        with self._lock:
+            candidates = set(self._unindexed)
+            for index_key in _killmail_keys(facts):
+                subscribers = self._index.get(index_key)
+                if subscribers:
+                    candidates |= subscribers
+            return [key for key in candidates if self._pipelines[key].evaluate_facts(facts)]
+
+    def _remove(self, key: Hashable) -> None:
+        if key not in self._pipelines:
+            return
+        del self._pipelines[key]
+        keys = self._keys.pop(key)
+        if keys is None:
+            self._unindexed.discard(key)
+            return
+        for index_key in keys:
+            subscribers = self._index[index_key]
+            subscribers.discard(key)
+            if not subscribers:
+                del self._index[index_key]
@@ -0,0 +1,255 @@
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+FLAG_NPC = 1
+FLAG_SOLO = 2
+FLAG_AWOX = 4
+
+_DIMENSIONS = {
+    "ship_type_id": "ship_type_id",
+    "solar_system_id": "solar_system_id",
+    "region_id": "region_id",
+    "alliance_id": "victim_alliance_id",
+}
+
+_ENTITY_COLUMNS = ("character", "corporation", "alliance")
+
+
+def _region_id(labels) -> int:
+    for label in labels or ():
+        if label.startswith("reg:"):
+            return int(label[4:])
+    return 0
+
+
+class HotWindow:
+    # Columnar ring buffer of recent killmails held in NumPy arrays. Slots
+    # are reused once `capacity` is reached and rows older than `max_age`
+    # seconds are masked out of every query, so analytics over the last few
+    # hours are vectorized scans that never touch the database.
+    #
+    # Attackers live in a second ring. When it wraps onto the rows of a
+    # killmail that is still held, that killmail (and every older one) is
+    # evicted too, so a kill is never counted with only part of its
+    # attackers; a kill with more attackers than the ring holds is skipped.
+
+    def __init__(self, capacity: int, max_age: float, attacker_capacity: int | None = None):
+        self.capacity = capacity
+        self.max_age = max_age
+        self.attacker_capacity = attacker_capacity or capacity * 8
+
+        self.serial = np.full(capacity, -1, dtype=np.int64)
+        self.killmail_id = np.zeros(capacity, dtype=np.int64)
+        self.time = np.zeros(capacity, dtype=np.int64)
+        self.solar_system_id = np.zeros(capacity, dtype=np.int64)
+        self.region_id = np.zeros(capacity, dtype=np.int64)
+        self.ship_type_id = np.zeros(capacity, dtype=np.int64)
+        self.value = np.zeros(capacity, dtype=np.float64)
+        self.flags = np.zeros(capacity, dtype=np.uint8)
+        self.victim_character_id = np.zeros(capacity, dtype=np.int64)
+        self.victim_corporation_id = np.zeros(capacity, dtype=np.int64)
+        self.victim_alliance_id = np.zeros(capacity, dtype=np.int64)
+
+        # One row per attacker, pointing back at its killmail's serial.
+        self.attacker_serial = np.full(self.attacker_capacity, -1, dtype=np.int64)
+        self.attacker_character_id = np.zeros(self.attacker_capacity, dtype=np.int64)
+        self.attacker_corporation_id = np.zeros(self.attacker_capacity, dtype=np.int64)
+        self.attacker_alliance_id = np.zeros(self.attacker_capacity, dtype=np.int64)
+
+        self._next = 0
+        self._next_attacker = 0
+        # Serials below this have had their attacker rows overwritten.
+        self._evicted = 0
+        self._ids: set[int] = set()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    # ── Ingest ──────────────────────────────────────────────────────
+
+    def add_killmail(self, killmail: dict) -> bool:
+        esi = killmail["esi"]
+        zkb = killmail.get("zkb", {})
+        victim = esi["victim"]
+        killmail_time = datetime.fromisoformat(esi["killmail_time"].replace("Z", "+00:00"))
+        return self._append(
+            killmail["killmail_id"],
+            int(killmail_time.timestamp()),
+            esi["solar_system_id"],
+            _region_id(zkb.get("labels")),
+            victim["ship_type_id"],
+            zkb.get("totalValue", 0),
+            bool(zkb.get("npc")) * FLAG_NPC
+            | bool(zkb.get("solo")) * FLAG_SOLO
+            | bool(zkb.get("awox")) * FLAG_AWOX,
+            (victim.get("character_id"), victim.get("corporation_id"), victim.get("alliance_id")),
+            [
+                (a.get("character_id"), a.get("corporation_id"), a.get("alliance_id"))
+                for a in esi.get("attackers", [])
+            ],
+        )
+
+    def add_row(self, row: dict) -> bool:
+        return self._append(
+            row["killmail_id"],
+            int(row["killmail_time"].replace(tzinfo=timezone.utc).timestamp()),
+            row["solar_system_id"],
+            _region_id(row["zkb_labels"]),
+            row["victim_ship_type_id"],
+            float(row["zkb_total_value"]),
+            bool(row["zkb_is_npc"]) * FLAG_NPC
+            | bool(row["zkb_is_solo"]) * FLAG_SOLO
+            | bool(row["zkb_is_awox"]) * FLAG_AWOX,
+            (row["victim_character_id"], row["victim_corporation_id"], row["victim_alliance_id"]),
+            [(a["character_id"], a["corporation_id"], a["alliance_id"]) for a in row["attackers"]],
+        )
+
+    def _append(
+        self,
+        killmail_id: int,
+        timestamp: int,
+        solar_system_id: int,
+        region_id: int,
+        ship_type_id: int,
+        value: float,
+        flags: int,
+        victim: tuple,
+        attackers: list[tuple],
+    ) -> bool:
+        # Backfilled kills can be older than the window; they would only
+        # take the slots of kills that are still in it.
+        if timestamp < time.time() - self.max_age or len(attackers) > self.attacker_capacity:
+            return False
+        with self._lock:
+            if killmail_id in self._ids:
+                return False
+            serial = self._next
+            slot = serial % self.capacity
+            if self.serial[slot] >= 0:
+                self._ids.discard(int(self.killmail_id[slot]))
+            self._next += 1
+            self._ids.add(killmail_id)
+
+            self.serial[slot] = serial
+            self.killmail_id[slot] = killmail_id
+            self.time[slot] = timestamp
+            self.solar_system_id[slot] = solar_system_id
+            self.region_id[slot] = region_id
+            self.ship_type_id[slot] = ship_type_id
+            self.value[slot] = value
+            self.flags[slot] = flags
+            self.victim_character_id[slot] = victim[0] or 0
+            self.victim_corporation_id[slot] = victim[1] or 0
+            self.victim_alliance_id[slot] = victim[2] or 0
+
+            if attackers:
+                rows = (self._next_attacker + np.arange(len(attackers))) % self.attacker_capacity
+                overwritten = int(self.attacker_serial[rows].max())
+                if overwritten >= self._evicted:
+                    self._evict_through(overwritten)
+            for character_id, corporation_id, alliance_id in attackers:
+                a = self._next_attacker % self.attacker_capacity
+                self._next_attacker += 1
+                self.attacker_serial[a] = serial
+                self.attacker_character_id[a] = character_id or 0
+                self.attacker_corporation_id[a] = corporation_id or 0
+                self.attacker_alliance_id[a] = alliance_id or 0
+            return True
+
+    def _evict_through(self, serial: int) -> None:
+        for evicted in range(self._evicted, serial + 1):
+            slot = evicted % self.capacity
+            if self.serial[slot] == evicted:
+                self._ids.discard(int(self.killmail_id[slot]))
+                self.serial[slot] = -1
+        self._evicted = serial + 1
+
+    # ── Queries ─────────────────────────────────────────────────────
+
+    def _mask(self, window: float | None) -> np.ndarray:
+        age = self.max_age if window is None else min(window, self.max_age)
+        return (self.serial >= 0) & (self.time >= int(time.time() - age))
+
+    def stats(self, window: float | None = None, top: int = 10) -> dict:
+        with self._lock:
+            mask = self._mask(window)
+            flags = self.flags[mask]
+            return {
+                "total_kills": int(mask.sum()),
+                "total_value": float(self.value[mask].sum()),
+                "kills_npc": int(np.count_nonzero(flags & FLAG_NPC)),
+                "kills_solo": int(np.count_nonzero(flags & FLAG_SOLO)),
+                "kills_awox": int(np.count_nonzero(flags & FLAG_AWOX)),
+                "top_ships": self._top(self.ship_type_id[mask], "ship_type_id", top),
+                "top_solar_systems": self._top(self.solar_system_id[mask], "solar_system_id", top),
+                "top_alliances": self._top(self.victim_alliance_id[mask], "alliance_id", top),
+            }
+
+    def top(self, dimension: str, window: float | None = None, n: int = 10, by: str = "count") -> list[dict]:
+        column = getattr(self, _DIMENSIONS[dimension])
+        with self._lock:
+            mask = self._mask(window)
+            weights = self.value[mask] if by == "value" else None
+            return self._top(column[mask], dimension, n, weights)
+
+    def timeseries(
+        self,
+        bucket: int,
+        window: float | None = None,
+        region_id: int | None = None,
+    ) -> list[dict]:
+        with self._lock:
+            mask = self._mask(window)
+            if region_id is not None:
+                mask &= self.region_id == region_id
+            times = self.time[mask]
+            values = self.value[mask]
+        if not len(times):
+            return []
+        buckets = times // bucket
+        first = buckets.min()
+        counts = np.bincount(buckets - first)
+        isk = np.bincount(buckets - first, weights=values)
+        return [
+            {
+                "bucket": datetime.fromtimestamp(int(first + i) * bucket, tz=timezone.utc),
+                "kills": int(counts[i]),
+                "total_value": float(isk[i]),
+            }
+            for i in np.flatnonzero(counts)
+        ]
+
+    def entity_activity(self, entity_type: str, entity_id: int, window: float | None = None) -> dict:
+        if entity_type not in _ENTITY_COLUMNS:
+            raise ValueError(entity_type)
+        with self._lock:
+            mask = self._mask(window)
+            losses = mask & (getattr(self, f"victim_{entity_type}_id") == entity_id)
+            serials = np.unique(
+                self.attacker_serial[getattr(self, f"attacker_{entity_type}_id") == entity_id]
+            )
+            slots = serials % self.capacity
+            # The killmail slot may have been reused since the attacker row was written.
+            slots = slots[(self.serial[slots] == serials) & mask[slots]]
+            return {
+                "kills": int(len(slots)),
+                "isk_destroyed": float(self.value[slots].sum()),
+                "losses": int(losses.sum()),
+                "isk_lost": float(self.value[losses].sum()),
+            }
+
+    @staticmethod
+    def _top(values: np.ndarray, name: str, n: int, weights: np.ndarray | None = None) -> list[dict]:
+        known = values != 0
+        values = values[known]
+        if not len(values):
+            return []
+        keys, inverse = np.unique(values, return_inverse=True)
+        totals = np.bincount(inverse, weights=None if weights is None else weights[known])
+        order = np.argsort(-totals, kind="stable")[:n]
+        field = "count" if weights is None else "total_value"
+        return [{name: int(keys[i]), field: totals[i].item()} for i in order]
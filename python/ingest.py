@@ -0,0 +1,291 @@
+import asyncio
+import logging
+import time
+from typing import Callable
+
+from sqlalchemy.exc import InterfaceError, OperationalError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from checkpoint import CheckpointStore, MySQLCheckpointStore
+from filters import CompiledPipeline, FilterPipeline
+from poller import AsyncZKillboardR2Z2
+
+logger = logging.getLogger(__name__)
+
+# save(batch, checkpoint) persists [(killmail, sequence_id), ...] and, when
+# given (name, sequence_id), moves that cursor in the same transaction.
+SaveBatch = Callable[[list[tuple[dict, int]], tuple[str, int] | None], None]
+
+# Failures worth retrying: the database is unreachable, restarting, or out
+# of connections. Anything else comes from the batch itself and would fail
+# again.
+TRANSIENT_ERRORS = (InterfaceError, PoolTimeoutError, ConnectionError, TimeoutError)
+
+# PyMySQL raises OperationalError for every server error it has no class
+# for, data errors such as a bad datetime (1292) included, so only these
+# codes are retried: connection refused or lost (2003, 2006, 2013), too
+# many connections (1040), lock wait timeout (1205) and deadlock (1213).
+TRANSIENT_MYSQL_ERRORS = (2003, 2006, 2013, 1040, 1205, 1213)
+
+
+def is_transient(exc: Exception) -> bool:
+    if isinstance(exc, OperationalError):
+        code = exc.orig.args[0] if exc.orig is not None and exc.orig.args else None
+        return code in TRANSIENT_MYSQL_ERRORS
+    return isinstance(exc, TRANSIENT_ERRORS)
+
+
+class StageMetrics:
+    # Counters for one pipeline stage. `busy` is time spent doing the
+    # stage's own work, `blocked` is time spent waiting for room in the
+    # next stage's queue: a busy stage with a full input queue is the
+    # bottleneck, a blocked one is being held back by the stage after it.
+
+    def __init__(self, name: str, queue: asyncio.Queue | None = None):
+        self.name = name
+        self.queue = queue
+        self.processed = 0
+        self.busy = 0.0
+        self.blocked = 0.0
+        self._started = time.monotonic()
+
+    def snapshot(self) -> dict:
+        uptime = max(time.monotonic() - self._started, 1e-9)
+        return {
+            "processed": self.processed,
+            "per_second": self.processed / uptime,
+            "busy_seconds": self.busy,
+            "blocked_seconds": self.blocked,
+            "queue_depth": self.queue.qsize() if self.queue is not None else None,
+            "queue_size": self.queue.maxsize if self.queue is not None else None,
+        }
+
+
+class IngestPipeline:
+    # fetch -> filter -> writers, connected by bounded queues. A full queue
+    # makes the stage before it wait, so a slow database holds back fetching
+    # instead of growing memory, and a slow response never stalls a write.
+    #
+    # Writers finish out of order, so the checkpoint only moves up to the
+    # sequence before the oldest killmail still in flight: everything at or
+    # below it has been stored or rejected.
+
+    def __init__(
+        self,
+        zkill: AsyncZKillboardR2Z2,
+        filters: FilterPipeline | CompiledPipeline | None,
+        save: SaveBatch,
+        checkpoint: CheckpointStore,
+        writers: int = 2,
+        queue_size: int = 1000,
+        batch_size: int = 50,
+        batch_interval: float = 2.0,
+        on_accept: list[Callable[[dict], object]] | None = None,
+    ):
+        self.zkill = zkill
+        self.filters = filters
+        self.save = save
+        self.checkpoint = checkpoint
+        self.writers = max(1, writers)
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.on_accept = on_accept or []
+        self.transactional = isinstance(checkpoint, MySQLCheckpointStore)
+        self.retry_delay = 5
+
+        self._filter_queue: asyncio.Queue[tuple[dict, int]] = asyncio.Queue(queue_size)
+        self._write_queue: asyncio.Queue[tuple[dict, int]] = asyncio.Queue(queue_size)
+        self._in_flight: set[int] = set()
+        self._commit_lock = asyncio.Lock()
+        self.stages = {
+            "fetch": StageMetrics("fetch"),
+            "filter": StageMetrics("filter", self._filter_queue),
+            "write": StageMetrics("write", self._write_queue),
+        }
+
+    def stats(self) -> dict:
+        # The poller counts fetches, so sequences whose zkb the prefilter
+        # rejected (never handed to this pipeline) are included.
+        self.stages["fetch"].processed = self.zkill.fetched
+        return {
+            "sequence_id": self.zkill.last_sequence_id,
+            "checkpoint": self.checkpoint.committed,
+            "in_flight": len(self._in_flight),
+            "stages": {name: stage.snapshot() for name, stage in self.stages.items()},
+        }
+
+    async def run(self) -> None:
+        # Resume where the poller would have: at the committed sequence.
+        self.zkill.last_sequence_id = await asyncio.to_thread(self.checkpoint.load)
+        fetch = asyncio.create_task(
+            self.zkill.poll(self._fetched, flush=self._commit), name="ingest-fetch"
+        )
+        tasks = [fetch, asyncio.create_task(self._filter_stage(), name="ingest-filter")]
+        tasks += [
+            asyncio.create_task(self._writer(), name=f"ingest-writer-{i}") for i in range(self.writers)
+        ]
+        try:
+            # The filter and writer stages never return, so one finishing
+            # has failed; stop everything rather than let fetch block on a
+            # queue nobody drains.
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task is not fetch:
+                    task.result()
+                    raise RuntimeError(f"{task.get_name()} stopped")
+            fetch.result()
+        finally:
+            # Killmails still queued are dropped; the checkpoint never moved
+            # past them, so they are fetched again on the next start.
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self._commit()
+
+    # ── Stages ──────────────────────────────────────────────────────
+
+    async def _fetched(self, killmail: dict, sequence_id: int) -> None:
+        stage = self.stages["fetch"]
+        self._in_flight.add(sequence_id)
+        started = time.monotonic()
+        await self._filter_queue.put((killmail, sequence_id))
+        stage.blocked += time.monotonic() - started
+
+    async def _filter_stage(self) -> None:
+        stage = self.stages["filter"]
+        while True:
+            killmail, sequence_id = await self._filter_queue.get()
+            started = time.monotonic()
+            try:
+                accepted = self.filters is None or await self.filters.evaluate_async(killmail)
+            except Exception:
+                logger.exception("Error filtering sequence %d, rejecting it", sequence_id)
+                accepted = False
+            if accepted:
+                # The hot window and feed are side channels: their failure
+                # must not keep the killmail from being stored.
+                for callback in self.on_accept:
+                    try:
+                        callback(killmail)
+                    except Exception:
+                        logger.exception("on_accept callback failed at sequence %d", sequence_id)
+            stage.processed += 1
+            stage.busy += time.monotonic() - started
+
+            if accepted:
+                started = time.monotonic()
+                await self._write_queue.put((killmail, sequence_id))
+                stage.blocked += time.monotonic() - started
+            else:
+                self._in_flight.discard(sequence_id)
+                await self._advance()
+
+    async def _writer(self) -> None:
+        stage = self.stages["write"]
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._write_queue.get()]
+            deadline = loop.time() + self.batch_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._write_queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            started = time.monotonic()
+            await self._persist(batch)
+            stage.processed += len(batch)
+            stage.busy += time.monotonic() - started
+            await self._advance()
+
+    async def _persist(self, batch: list[tuple[dict, int]]) -> None:
+        # Retries until the batch is stored (its sequences hold back the
+        # checkpoint until then), unless the batch itself is at fault.
+        sequences = {sequence_id for _, sequence_id in batch}
+        try:
+            cursor = await self._store(batch, sequences)
+        except Exception:
+            cursor = None
+            if len(batch) == 1:
+                self._drop(*batch[0])
+            else:
+                logger.exception(
+                    "Error saving killmails at sequences %d-%d, saving them one at a time",
+                    batch[0][1], batch[-1][1],
+                )
+                cursor = await self._store_each(batch)
+        self._in_flight -= sequences
+        if cursor is not None:
+            self.checkpoint.mark_committed(cursor[1])
+
+    async def _store_each(self, batch: list[tuple[dict, int]]) -> tuple[str, int] | None:
+        # Saves a failed batch one killmail at a time so only the bad ones
+        # are dropped. Each save's cursor skips the killmail itself and the
+        # ones already stored or dropped, but not the ones still to come:
+        # a crash between saves must not resume past them.
+        committed = None
+        done: set[int] = set()
+        for killmail, sequence_id in batch:
+            try:
+                committed = await self._store([(killmail, sequence_id)], done | {sequence_id}) or committed
+            except Exception:
+                self._drop(killmail, sequence_id)
+            done.add(sequence_id)
+        return committed
+
+    def _drop(self, killmail: dict, sequence_id: int) -> None:
+        logger.exception(
+            "Dropping killmail %s at sequence %d: it cannot be saved",
+            killmail.get("killmail_id"), sequence_id,
+        )
+
+    async def _store(self, batch: list[tuple[dict, int]], exclude: set[int]) -> tuple[str, int] | None:
+        # Returns the cursor written with the save, which excludes the given
+        # sequences from those still in flight. Transient failures are
+        # retried; anything else is raised.
+        while True:
+            cursor = None
+            if self.transactional:
+                cursor = (self.checkpoint.name, self._safe_sequence(exclude=exclude))
+            try:
+                await asyncio.to_thread(self.save, batch, cursor)
+                return cursor
+            except Exception as exc:
+                if not is_transient(exc):
+                    raise
+                logger.exception(
+                    "Error saving killmails at sequences %d-%d, retrying",
+                    batch[0][1], batch[-1][1],
+                )
+                await asyncio.sleep(self.retry_delay)
+
+    # ── Checkpoint ──────────────────────────────────────────────────
+
+    def _safe_sequence(self, exclude: set[int] = frozenset()) -> int:
+        pending = [s for s in self._in_flight if s not in exclude]
+        if pending:
+            return min(pending) - 1
+        return self.zkill.last_sequence_id
+
+    async def _advance(self) -> None:
+        sequence_id = self._safe_sequence()
+        if sequence_id > self.checkpoint.pending and self.checkpoint.advance(sequence_id):
+            await self._write_checkpoint()
+
+    async def _commit(self) -> None:
+        sequence_id = self._safe_sequence()
+        if sequence_id > self.checkpoint.pending:
+            self.checkpoint.advance(sequence_id)
+        await self._write_checkpoint()
+
+    async def _write_checkpoint(self) -> None:
+        # Serialized so an older cursor never overwrites a newer one.
+        async with self._commit_lock:
+            try:
+                await asyncio.to_thread(self.checkpoint.commit)
+            except Exception:
+                # Still pending, so the next advance or commit retries it.
+                logger.exception("Error writing checkpoint %d", self.checkpoint.pending)
@@ -1,18 +1,59 @@
+import asyncio
+import hashlib
 import logging
 import threading
+import time
+from contextlib import asynccontextmanager, suppress
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from typing import Callable, Literal
 
-from fastapi import FastAPI, Depends, Query, HTTPException
+import httpx
+from fastapi import FastAPI, Depends, Header, Query, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from sqlalchemy import text
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from checkpoint import CheckpointStore, FileCheckpointStore, MySQLCheckpointStore
 from config import settings
-from database import get_db, SessionLocal
+from database import async_engine, get_async_db, SessionLocal
 from filters import FilterPipeline
-from filters.level1 import NpcFilter, SecurityFilter
-from filters.level2 import MinValueFilter
+from filters.level1 import AwoxFilter, NpcFilter, SecurityFilter, SoloFilter
+from filters.level2 import (
+    AllianceFilter,
+    CharacterFilter,
+    CorporationFilter,
+    MaxValueFilter,
+    MinValueFilter,
+    RegionFilter,
+    ShipTypeFilter,
+    SolarSystemFilter,
+)
 from models import KillmailListResponse, KillmailDetail, StatsResponse
-from poller import ZKillboardR2Z2
-from repository import KillmailRepository
+from archive import SegmentArchive
+from backfill import Backfill
+from feed import FeedHub, SlowConsumerPolicy, Subscriber
+from cache import ByteLRUCache
+from hotwindow import HotWindow
+from ingest import IngestPipeline
+from metrics import CONTENT_TYPE, REGISTRY, Gauge, Histogram
+from poller import AsyncZKillboardR2Z2, RateLimiter
+from poller_filters import build_pipeline
+from repository import (
+    SUMMARY_COLUMNS,
+    AsyncKillmailRepository,
+    CountStrategy,
+    InvalidCursor,
+    KillmailRepository,
+)
+from serialization import (
+    csv_header,
+    render_csv,
+    render_kill_detail,
+    render_kill_details,
+    render_kill_list,
+    render_ndjson,
+)
 
 logging.basicConfig(
     level=logging.INFO,
@@ -20,76 +61,302 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="zKillboard R2Z2 Client", version="1.0.0")
+rate_limiter = RateLimiter(settings.poller_rate_limit)
+
+MAX_BATCH_IDS = 100
+
+# Killmails never change once stored, so rendered detail responses are
+# cached for the life of the process and marked immutable for clients.
+detail_cache = ByteLRUCache(settings.detail_cache_bytes)
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+# One shutdown event per running backfill: a failed run stops only its own
+# workers, and the lifespan stops them all.
+backfill_events: set[threading.Event] = set()
+backfill_tasks: set[asyncio.Task] = set()
+
+ingest: IngestPipeline | None = None
+POLLER_RESTART_DELAY = 30
+
+feed_hub = FeedHub(settings.feed_queue_size, settings.feed_policy)
+FEED_HEARTBEAT = 15
 
-shutdown_event = threading.Event()
+hot_window = (
+    HotWindow(settings.hot_window_capacity, settings.hot_window_hours * 3600)
+    if settings.hot_window_enabled
+    else None
+)
 
 
 # ── Poller ──────────────────────────────────────────────────────────
 
 
-def _run_poller():
-    pipeline = FilterPipeline()
-    if settings.poller_exclude_npc:
-        pipeline.add_level1(NpcFilter(exclude=True))
-    if settings.poller_security_zones:
-        pipeline.add_level1(SecurityFilter(allow=settings.poller_security_zones))
-    if settings.poller_min_value:
-        pipeline.add_level2(MinValueFilter(settings.poller_min_value))
-
-    zkill = ZKillboardR2Z2(
-        state_file=settings.poller_state_file,
-        filters=pipeline,
-        shutdown_event=shutdown_event,
+def _build_checkpoint() -> CheckpointStore:
+    options = {
+        "every": settings.poller_checkpoint_every,
+        "interval": settings.poller_checkpoint_interval,
+    }
+    if settings.poller_checkpoint == "mysql":
+        return MySQLCheckpointStore(SessionLocal, **options)
+    return FileCheckpointStore(settings.poller_state_file, **options)
+
+
+def _save_killmails(batch: list[tuple[dict, int]], checkpoint: tuple[str, int] | None) -> None:
+    first, last = batch[0][1], batch[-1][1]
+    with SessionLocal() as db:
+        repo = KillmailRepository(db)
+        saved = repo.save_many([killmail for killmail, _ in batch], checkpoint=checkpoint)
+    value = sum(killmail.get("zkb", {}).get("totalValue", 0) for killmail, _ in batch)
+    logger.info(
+        "[#%d-#%d] %d kills | %s ISK | %d saved, %d skipped (duplicate)",
+        first, last, len(batch), f"{value:,.0f}", saved, len(batch) - saved,
+    )
+
+
+def _load_hot_window() -> None:
+    since = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(hours=settings.hot_window_hours)
+    with SessionLocal() as db:
+        rows = KillmailRepository(db).recent_kills(since)
+    for row in rows:
+        hot_window.add_row(row)
+    logger.info("Hot window loaded: %d kills since %s", len(hot_window), since)
+
+
+async def _run_poller():
+    global ingest
+    filters = build_pipeline().compile(adaptive=True)
+    zkill = AsyncZKillboardR2Z2(
+        rate_limiter=rate_limiter,
+        prefetch=settings.poller_prefetch,
+        staged_decode=settings.poller_staged_decode,
+        prefilter=filters,
+        archive=SegmentArchive(settings.archive_dir) if settings.archive_dir else None,
+    )
+    on_accept = [feed_hub.publish]
+    if hot_window is not None:
+        on_accept.insert(0, hot_window.add_killmail)
+    FILTER_EVALUATIONS.set_function(lambda: _filter_counts(filters, "runs"))
+    FILTER_REJECTIONS.set_function(lambda: _filter_counts(filters, "rejections"))
+    ingest = IngestPipeline(
+        zkill,
+        filters,
+        _save_killmails,
+        _build_checkpoint(),
+        writers=settings.poller_writers,
+        queue_size=settings.poller_queue_size,
+        batch_size=settings.poller_batch_size,
+        batch_interval=settings.poller_batch_interval,
+        on_accept=on_accept,
     )
+    reporter = asyncio.create_task(_report_ingest(ingest))
+    head = asyncio.create_task(_refresh_head(zkill)) if settings.metrics_head_interval else None
+    try:
+        await ingest.run()
+    finally:
+        reporter.cancel()
+        if head is not None:
+            head.cancel()
+        await zkill.aclose()
+        if zkill.archive is not None:
+            zkill.archive.close()
+
 
-    def on_killmail(killmail: dict, sequence_id: int):
-        db = SessionLocal()
+async def _supervise_poller():
+    # A failed poller would otherwise leave ingest stopped until restart.
+    while True:
         try:
-            repo = KillmailRepository(db)
-            saved = repo.save(killmail)
-            kill_id = killmail["killmail_id"]
-            value = killmail.get("zkb", {}).get("totalValue", 0)
-            status = "saved" if saved else "skipped (duplicate)"
-            logger.info("[#%d] Kill %d | %s ISK | %s", sequence_id, kill_id, f"{value:,.0f}", status)
+            await _run_poller()
+            return
         except Exception:
-            logger.exception("Error saving killmail at sequence %d", sequence_id)
-        finally:
-            db.close()
+            logger.exception("Poller failed, restarting in %ds", POLLER_RESTART_DELAY)
+        await asyncio.sleep(POLLER_RESTART_DELAY)
+
+
+def _log_task_failure(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Task %s failed", task.get_name(), exc_info=task.exception())
 
-    zkill.poll(on_killmail)
 
+async def _report_ingest(pipeline: IngestPipeline):
+    previous = {name: 0 for name in pipeline.stages}
+    while True:
+        await asyncio.sleep(settings.ingest_report_interval)
+        stats = pipeline.stats()
+        parts = []
+        for name, stage in stats["stages"].items():
+            rate = (stage["processed"] - previous[name]) / settings.ingest_report_interval
+            previous[name] = stage["processed"]
+            queue = f" q={stage['queue_depth']}/{stage['queue_size']}" if stage["queue_size"] else ""
+            parts.append(f"{name} {rate:.1f}/s{queue}")
+        logger.info(
+            "Ingest #%d (checkpoint #%d): %s",
+            stats["sequence_id"], stats["checkpoint"], " | ".join(parts),
+        )
 
-@app.on_event("startup")
-def startup():
+
+async def _refresh_head(zkill: AsyncZKillboardR2Z2):
+    # The poller only learns the head at startup and at the tail, so while
+    # it is behind, the lag metric relies on this.
+    while True:
+        await asyncio.sleep(settings.metrics_head_interval)
+        try:
+            await zkill.get_current_sequence()
+        except Exception as e:
+            logger.warning("Could not refresh the R2Z2 head sequence: %s", e)
+
+
+# ── Metrics ─────────────────────────────────────────────────────────
+
+ROUTE_SECONDS = Histogram(
+    "http_request_duration_seconds", "API request latency", ["method", "route", "status"]
+)
+SEQUENCE = Gauge("r2z2_sequence", "R2Z2 sequence IDs: head, fetched and checkpointed", ["kind"])
+SEQUENCE_LAG = Gauge("r2z2_sequence_lag", "Sequences between the R2Z2 head and the last one fetched")
+INGEST_PROCESSED = Gauge(
+    "ingest_processed_total", "Killmails through each ingest stage", ["stage"], kind="counter"
+)
+INGEST_QUEUE_DEPTH = Gauge("ingest_queue_depth", "Killmails waiting for each ingest stage", ["stage"])
+FILTER_EVALUATIONS = Gauge(
+    "filter_evaluations_total",
+    "Poller filter evaluations; stage is prefilter (zkb only) or full",
+    ["level", "filter", "stage"],
+    kind="counter",
+)
+FILTER_REJECTIONS = Gauge(
+    "filter_rejections_total",
+    "Killmails rejected by each poller filter",
+    ["level", "filter", "stage"],
+    kind="counter",
+)
+
+
+def _filter_counts(pipeline, field: str) -> dict[tuple, int]:
+    counts: dict[tuple, int] = {}
+    for stage in pipeline.stage_counts():
+        for name, key in (("full", field), ("prefilter", f"prefilter_{field}")):
+            labels = (stage["level"], stage["filter"], name)
+            counts[labels] = counts.get(labels, 0) + stage[key]
+    return counts
+
+
+def _sequences() -> dict[tuple, int] | None:
+    if ingest is None:
+        return None
+    return {
+        ("head",): ingest.zkill.head_sequence_id or None,
+        ("fetched",): ingest.zkill.last_sequence_id,
+        ("checkpoint",): ingest.checkpoint.committed,
+    }
+
+
+def _sequence_lag() -> int | None:
+    if ingest is None or not ingest.zkill.head_sequence_id:
+        return None
+    return max(0, ingest.zkill.head_sequence_id - ingest.zkill.last_sequence_id)
+
+
+def _ingest_stages(field: str) -> dict[tuple, int] | None:
+    if ingest is None:
+        return None
+    return {(name,): stage[field] for name, stage in ingest.stats()["stages"].items()}
+
+
+SEQUENCE.set_function(_sequences)
+SEQUENCE_LAG.set_function(_sequence_lag)
+INGEST_PROCESSED.set_function(lambda: _ingest_stages("processed"))
+INGEST_QUEUE_DEPTH.set_function(lambda: _ingest_stages("queue_depth"))
+
+
+class RouteMetricsMiddleware:
+    # Plain ASGI middleware: times every HTTP request to its last body
+    # chunk (so streaming responses count in full) and labels it with the
+    # route template, not the raw path, to keep label cardinality bounded.
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = time.monotonic()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            ROUTE_SECONDS.labels(
+                scope["method"], getattr(route, "path", "unmatched"), status
+            ).observe(time.monotonic() - started)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    poller = None
+    if hot_window is not None:
+        try:
+            await asyncio.to_thread(_load_hot_window)
+        except Exception:
+            logger.exception("Error loading hot window, starting empty")
     if settings.poller_enabled:
-        thread = threading.Thread(target=_run_poller, daemon=True)
-        thread.start()
-        logger.info("Poller thread started")
+        poller = asyncio.create_task(_supervise_poller(), name="r2z2-poller")
+        poller.add_done_callback(_log_task_failure)
+        logger.info("Poller task started")
+    yield
+    feed_hub.close()
+    for event in list(backfill_events):
+        event.set()
+    if poller is not None:
+        logger.info("Shutting down poller...")
+        poller.cancel()
+        # The done callback has logged any failure; teardown must go on.
+        with suppress(asyncio.CancelledError, Exception):
+            await poller
+    if backfill_tasks:
+        await asyncio.gather(*backfill_tasks, return_exceptions=True)
+    await async_engine.dispose()
 
 
-@app.on_event("shutdown")
-def shutdown():
-    logger.info("Shutting down poller...")
-    shutdown_event.set()
+app = FastAPI(title="zKillboard R2Z2 Client", version="1.0.0", lifespan=lifespan)
+app.add_middleware(RouteMetricsMiddleware)
 
 
 # ── Routes ──────────────────────────────────────────────────────────
 
 
 @app.get("/health")
-def health(db: Session = Depends(get_db)):
+async def health(db: AsyncSession = Depends(get_async_db)):
     try:
-        db.execute(text("SELECT 1"))
+        await db.execute(text("SELECT 1"))
         return {"status": "ok"}
     except Exception:
         raise HTTPException(status_code=503, detail="Database unavailable")
 
 
+@app.get("/metrics")
+def metrics():
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+@app.get("/ingest")
+def ingest_stats():
+    if ingest is None:
+        raise HTTPException(status_code=503, detail="Poller not running")
+    return ingest.stats()
+
+
 @app.get("/kills", response_model=KillmailListResponse)
-def list_kills(
+async def list_kills(
     limit: int = Query(50, ge=1, le=1000),
     offset: int = Query(0, ge=0),
+    cursor: str | None = Query(None),
+    count: CountStrategy = Query("exact"),
     min_value: float | None = Query(None),
     max_value: float | None = Query(None),
     solar_system_id: int | None = Query(None, ge=1),
@@ -100,36 +367,321 @@ def list_kills(
     npc: bool | None = Query(None),
     solo: bool | None = Query(None),
     awox: bool | None = Query(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    repo = KillmailRepository(db)
-    kills, total = repo.list_kills(
-        limit=limit,
-        offset=offset,
-        min_value=min_value,
-        max_value=max_value,
-        solar_system_id=solar_system_id,
-        ship_type_id=ship_type_id,
-        character_id=character_id,
-        corporation_id=corporation_id,
-        alliance_id=alliance_id,
-        npc=npc,
-        solo=solo,
-        awox=awox,
+    repo = AsyncKillmailRepository(db)
+    try:
+        result = await repo.list_kills(
+            limit=limit,
+            offset=offset,
+            cursor=cursor,
+            count=count,
+            raw=settings.api_fast_json,
+            min_value=min_value,
+            max_value=max_value,
+            solar_system_id=solar_system_id,
+            ship_type_id=ship_type_id,
+            character_id=character_id,
+            corporation_id=corporation_id,
+            alliance_id=alliance_id,
+            npc=npc,
+            solo=solo,
+            awox=awox,
+        )
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if settings.api_fast_json:
+        return Response(render_kill_list(result, SUMMARY_COLUMNS), media_type="application/json")
+    return KillmailListResponse(**result)
+
+
+@app.get("/kills/export")
+def export_kills(
+    fmt: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    include_children: bool = Query(False, description="Include attackers and items"),
+    min_value: float | None = Query(None),
+    max_value: float | None = Query(None),
+    solar_system_id: int | None = Query(None, ge=1),
+    ship_type_id: int | None = Query(None, ge=1),
+    character_id: int | None = Query(None, ge=1),
+    corporation_id: int | None = Query(None, ge=1),
+    alliance_id: int | None = Query(None, ge=1),
+    npc: bool | None = Query(None),
+    solo: bool | None = Query(None),
+    awox: bool | None = Query(None),
+):
+    filters = {
+        "min_value": min_value,
+        "max_value": max_value,
+        "solar_system_id": solar_system_id,
+        "ship_type_id": ship_type_id,
+        "character_id": character_id,
+        "corporation_id": corporation_id,
+        "alliance_id": alliance_id,
+        "npc": npc,
+        "solo": solo,
+        "awox": awox,
+    }
+    render = render_csv if fmt == "csv" else render_ndjson
+
+    # The session is opened inside the generator so it lives as long as
+    # the stream, not the request handler.
+    def stream():
+        if fmt == "csv":
+            yield csv_header(include_children)
+        with SessionLocal() as db:
+            repo = KillmailRepository(db)
+            for kills in repo.export_kills(include_children=include_children, **filters):
+                yield render(kills, include_children)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/csv" if fmt == "csv" else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="kills.{fmt}"'},
     )
-    return KillmailListResponse(total=total, kills=kills)
+
+
+@app.get("/kills/batch", response_model=list[KillmailDetail])
+async def get_kills(
+    ids: str = Query(..., pattern=r"^\d+(,\d+)*$", description="Comma-separated killmail IDs"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    killmail_ids = [int(i) for i in ids.split(",")]
+    if len(killmail_ids) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=422, detail=f"At most {MAX_BATCH_IDS} ids per request")
+    repo = AsyncKillmailRepository(db)
+    kills = await repo.get_kills(killmail_ids)
+    if settings.api_fast_json:
+        return Response(render_kill_details(kills), media_type="application/json")
+    return kills
 
 
 @app.get("/kills/{killmail_id}", response_model=KillmailDetail)
-def get_kill(killmail_id: int, db: Session = Depends(get_db)):
-    repo = KillmailRepository(db)
-    kill = repo.get_kill(killmail_id)
-    if kill is None:
-        raise HTTPException(status_code=404, detail="Killmail not found")
-    return kill
+async def get_kill(
+    killmail_id: int,
+    if_none_match: str | None = Header(None),
+    db: AsyncSession = Depends(get_async_db),
+):
+    cached = detail_cache.get(killmail_id)
+    if cached is None:
+        repo = AsyncKillmailRepository(db)
+        kill = await repo.get_kill(killmail_id)
+        if kill is None:
+            raise HTTPException(status_code=404, detail="Killmail not found")
+        if settings.api_fast_json:
+            body = render_kill_detail(kill)
+        else:
+            body = JSONResponse(KillmailDetail.model_validate(kill).model_dump(mode="json")).body
+        etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        detail_cache.set(killmail_id, body, etag)
+    else:
+        body, etag = cached
+
+    headers = {"ETag": etag, "Cache-Control": IMMUTABLE}
+    if if_none_match is not None and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match uses the weak comparison (RFC 9110, 13.1.2): a W/
+    # prefix on either tag is ignored, e.g. when a proxy weakened ours.
+    if if_none_match.strip() == "*":
+        return True
+    return etag.removeprefix("W/") in (t.strip().removeprefix("W/") for t in if_none_match.split(","))
 
 
 @app.get("/stats", response_model=StatsResponse)
-def get_stats(db: Session = Depends(get_db)):
-    repo = KillmailRepository(db)
-    return repo.get_stats()
+async def get_stats(
+    since: datetime | None = Query(None),
+    until: datetime | None = Query(None),
+    window: str | None = Query(None, pattern=r"^\d+[hd]$"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    # Buckets are naive UTC, like killmail_time.
+    since, until = (
+        d.astimezone(timezone.utc).replace(tzinfo=None) if d and d.tzinfo else d
+        for d in (since, until)
+    )
+    if window is not None:
+        amount, unit = int(window[:-1]), window[-1]
+        until = until or datetime.now(timezone.utc).replace(tzinfo=None)
+        since = until - (timedelta(hours=amount) if unit == "h" else timedelta(days=amount))
+    repo = AsyncKillmailRepository(db)
+    return await repo.get_stats(since=since, until=until)
+
+
+def _hot_window_seconds(window: str | None) -> float | None:
+    if window is None:
+        return None
+    amount, unit = int(window[:-1]), window[-1]
+    return amount * {"s": 1, "m": 60, "h": 3600}[unit]
+
+
+def _require_hot_window() -> HotWindow:
+    if hot_window is None:
+        raise HTTPException(status_code=503, detail="Hot window disabled")
+    return hot_window
+
+
+@app.get("/stats/hot", response_model=StatsResponse)
+def get_hot_stats(window: str | None = Query(None, pattern=r"^\d+[smh]$")):
+    # Served from memory; windows are capped at HOT_WINDOW_HOURS.
+    return _require_hot_window().stats(_hot_window_seconds(window))
+
+
+@app.get("/stats/hot/top")
+def get_hot_top(
+    dimension: Literal["ship_type_id", "solar_system_id", "region_id", "alliance_id"] = Query(...),
+    by: Literal["count", "value"] = Query("count"),
+    limit: int = Query(10, ge=1, le=100),
+    window: str | None = Query(None, pattern=r"^\d+[smh]$"),
+):
+    return _require_hot_window().top(dimension, _hot_window_seconds(window), limit, by)
+
+
+@app.get("/stats/hot/timeseries")
+def get_hot_timeseries(
+    bucket: str = Query("5m", pattern=r"^\d+[smh]$"),
+    region_id: int | None = Query(None, ge=1),
+    window: str | None = Query(None, pattern=r"^\d+[smh]$"),
+):
+    seconds = _hot_window_seconds(bucket)
+    if seconds == 0:
+        raise HTTPException(status_code=422, detail="bucket must be positive")
+    return _require_hot_window().timeseries(int(seconds), _hot_window_seconds(window), region_id)
+
+
+@app.get("/stats/hot/{entity_type}/{entity_id}")
+def get_hot_entity(
+    entity_type: Literal["character", "corporation", "alliance"],
+    entity_id: int,
+    window: str | None = Query(None, pattern=r"^\d+[smh]$"),
+):
+    return _require_hot_window().entity_activity(entity_type, entity_id, _hot_window_seconds(window))
+
+
+async def _feed_pipeline(
+    character_id: list[int] | None = Query(None),
+    corporation_id: list[int] | None = Query(None),
+    alliance_id: list[int] | None = Query(None),
+    ship_type_id: list[int] | None = Query(None),
+    solar_system_id: list[int] | None = Query(None),
+    region_id: list[int] | None = Query(None),
+    security: list[str] | None = Query(None),
+    min_value: float | None = Query(None),
+    max_value: float | None = Query(None),
+    npc: bool | None = Query(None),
+    solo: bool | None = Query(None),
+    awox: bool | None = Query(None),
+) -> FilterPipeline:
+    pipeline = FilterPipeline()
+    if npc is not None:
+        pipeline.add_level1(NpcFilter(exclude=not npc))
+    if solo is not None:
+        pipeline.add_level1(SoloFilter(exclude=not solo))
+    if awox is not None:
+        pipeline.add_level1(AwoxFilter(exclude=not awox))
+    if security:
+        pipeline.add_level1(SecurityFilter(allow=security))
+    if min_value is not None:
+        pipeline.add_level2(MinValueFilter(min_value))
+    if max_value is not None:
+        pipeline.add_level2(MaxValueFilter(max_value))
+    if character_id:
+        pipeline.add_level2(CharacterFilter(character_id))
+    if corporation_id:
+        pipeline.add_level2(CorporationFilter(corporation_id))
+    if alliance_id:
+        pipeline.add_level2(AllianceFilter(alliance_id))
+    if ship_type_id:
+        pipeline.add_level2(ShipTypeFilter(ship_type_id))
+    if solar_system_id:
+        pipeline.add_level2(SolarSystemFilter(solar_system_id))
+    if region_id:
+        pipeline.add_level2(RegionFilter(region_id))
+    return pipeline
+
+
+async def _feed_subscribe(
+    pipeline: FilterPipeline = Depends(_feed_pipeline),
+    queue_size: int | None = Query(None, ge=1, le=10_000),
+    policy: SlowConsumerPolicy | None = Query(None),
+) -> Callable[[], Subscriber]:
+    # The handlers subscribe and unsubscribe themselves: before FastAPI
+    # 0.118 a yield dependency is torn down before a StreamingResponse body
+    # is sent, which would unsubscribe the client before its first event.
+    return partial(feed_hub.subscribe, pipeline, queue_size, policy)
+
+
+@app.get("/feed")
+async def feed_sse(subscribe: Callable[[], Subscriber] = Depends(_feed_subscribe)):
+    # Server-Sent Events; a comment line is sent when idle so proxies keep
+    # the connection open. The generator is closed however the response
+    # ends, so its finally removes the subscriber.
+    async def stream():
+        subscriber = subscribe()
+        try:
+            while True:
+                try:
+                    event = await subscriber.get(FEED_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                if event is None:
+                    return
+                yield b"id: %d\nevent: killmail\ndata: %s\n\n" % (event.killmail_id, event.data)
+        finally:
+            feed_hub.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.websocket("/feed/ws")
+async def feed_ws(websocket: WebSocket, subscribe: Callable[[], Subscriber] = Depends(_feed_subscribe)):
+    await websocket.accept()
+    subscriber = subscribe()
+    try:
+        while (event := await subscriber.get()) is not None:
+            await websocket.send_text(event.data.decode())
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        feed_hub.unsubscribe(subscriber)
+
+
+@app.post("/backfill", status_code=202)
+async def start_backfill(
+    start: int = Query(..., ge=1),
+    end: int = Query(..., ge=1),
+):
+    if end <= start:
+        raise HTTPException(status_code=422, detail="end must be greater than start")
+    # Shares the live poller's rate limiter so both stay within the R2Z2 quota.
+    backfill = Backfill(
+        SessionLocal,
+        filters=build_pipeline().compile(adaptive=True),
+        workers=settings.backfill_workers,
+        rate_limiter=rate_limiter,
+        on_accept=hot_window.add_killmail if hot_window is not None else None,
+    )
+    try:
+        end = await asyncio.to_thread(backfill.clamp, end)
+    except httpx.HTTPError as e:
+        backfill.zkill.close()
+        raise HTTPException(status_code=503, detail=f"Could not read the R2Z2 head: {e}")
+    chunks = backfill.chunks(start, end)
+    task = asyncio.create_task(
+        asyncio.to_thread(backfill.run, start, end, clamped=True), name=f"backfill:{start}-{end}"
+    )
+    backfill_events.add(backfill.shutdown_event)
+    backfill_tasks.add(task)
+    task.add_done_callback(_log_task_failure)
+    task.add_done_callback(backfill_tasks.discard)
+    task.add_done_callback(lambda _: backfill_events.discard(backfill.shutdown_event))
+    return {"start": start, "end": end, "chunks": len(chunks)}
@@ -0,0 +1,261 @@
+import math
+import threading
+import weakref
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Callable, Iterable
+
+# Minimal Prometheus instrumentation. Increments never take a lock: each
+# thread owns a shard of every counter and histogram and only ever writes
+# to its own, and a scrape sums the shards. Creating a labelled child is a
+# single dict.setdefault, which is atomic under the GIL.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _ShardOwner:
+    # Held only by the owning thread's threading.local, so it is freed
+    # when that thread exits.
+    __slots__ = ("__weakref__",)
+
+
+class _Shards:
+    # A thread's shard is reached through a threading.local. When the
+    # thread exits, its shard is folded into `_retired`, so short-lived
+    # threads (to_thread workers, backfill pools) do not pile up shards.
+    # The lock is only taken to create, retire or sum shards.
+    __slots__ = ("size", "_local", "_live", "_retired", "_lock")
+
+    def __init__(self, size: int):
+        self.size = size
+        self._local = threading.local()
+        self._live: dict[int, list[float]] = {}
+        self._retired = [0.0] * size
+        self._lock = threading.Lock()
+
+    def local(self) -> list[float]:
+        try:
+            return self._local.shard
+        except AttributeError:
+            return self._new()
+
+    def _new(self) -> list[float]:
+        shard = [0.0] * self.size
+        owner = _ShardOwner()
+        with self._lock:
+            self._live[id(owner)] = shard
+        weakref.finalize(owner, self._retire, id(owner))
+        self._local.owner = owner
+        self._local.shard = shard
+        return shard
+
+    def _retire(self, key: int) -> None:
+        with self._lock:
+            shard = self._live.pop(key)
+            for i, value in enumerate(shard):
+                self._retired[i] += value
+
+    def total(self) -> list[float]:
+        with self._lock:
+            totals = list(self._retired)
+            for shard in self._live.values():
+                for i, value in enumerate(shard):
+                    totals[i] += value
+        return totals
+
+
+class _CounterChild:
+    __slots__ = ("_shards",)
+
+    def __init__(self):
+        self._shards = _Shards(1)
+
+    def inc(self, amount: float = 1) -> None:
+        self._shards.local()[0] += amount
+
+    @property
+    def value(self) -> float:
+        return self._shards.total()[0]
+
+
+class _HistogramChild:
+    # Shard layout: one slot per bucket (non-cumulative, +Inf last), then
+    # the running sum.
+    __slots__ = ("buckets", "_shards")
+
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        self._shards = _Shards(len(buckets) + 2)
+
+    def observe(self, value: float) -> None:
+        shard = self._shards.local()
+        shard[bisect_left(self.buckets, value)] += 1
+        shard[-1] += value
+
+    def snapshot(self) -> tuple[list[float], float]:
+        totals = self._shards.total()
+        cumulative, running = [], 0.0
+        for count in totals[:-1]:
+            running += count
+            cumulative.append(running)
+        return cumulative, totals[-1]
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        (registry or REGISTRY).register(self)
+
+    def _label_text(self, values: tuple[str, ...], extra: tuple[tuple[str, str], ...] = ()) -> str:
+        pairs = [*zip(self.labelnames, values), *extra]
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+    @abstractmethod
+    def samples(self) -> list[str]: ...
+
+
+class _ChildMetric(_Metric):
+    # Metrics recorded in process, one child per set of label values.
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), registry=None):
+        self._children: dict[tuple[str, ...], object] = {}
+        super().__init__(name, documentation, labelnames, registry)
+
+    def labels(self, *values) -> object:
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            child = self._children.setdefault(key, self._child())
+        return child
+
+    @abstractmethod
+    def _child(self) -> object: ...
+
+
+class Counter(_ChildMetric):
+    # Name it with the _total suffix; samples use the name as given.
+    kind = "counter"
+
+    def _child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1) -> None:
+        self.labels().inc(amount)
+
+    def samples(self) -> list[str]:
+        return [
+            f"{self.name}{self._label_text(values)} {_number(child.value)}"
+            for values, child in list(self._children.items())
+        ]
+
+
+class Histogram(_ChildMetric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+        registry=None,
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def samples(self) -> list[str]:
+        lines = []
+        for values, child in list(self._children.items()):
+            cumulative, total = child.snapshot()
+            for bound, count in zip((*self.buckets, math.inf), cumulative):
+                le = self._label_text(values, (("le", _number(bound)),))
+                lines.append(f"{self.name}_bucket{le} {_number(count)}")
+            labels = self._label_text(values)
+            lines.append(f"{self.name}_sum{labels} {_number(total)}")
+            lines.append(f"{self.name}_count{labels} {_number(cumulative[-1])}")
+        return lines
+
+
+class Gauge(_Metric):
+    # Read at scrape time from a callback returning a value, or a dict of
+    # {label values: value}, so state that already lives elsewhere
+    # (sequence IDs, queue depths, filter counts) is not copied on every
+    # change. Pass kind="counter" for callbacks that return running totals.
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        kind: str = "gauge",
+        registry=None,
+    ):
+        super().__init__(name, documentation, labelnames, registry)
+        self.kind = kind
+        self._function: Callable[[], dict[tuple, float] | float | None] | None = None
+
+    def set_function(self, function: Callable[[], dict[tuple, float] | float | None] | None) -> None:
+        self._function = function
+
+    def samples(self) -> list[str]:
+        values = self._function() if self._function is not None else None
+        if values is None:
+            return []
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [
+            f"{self.name}{self._label_text(tuple(str(v) for v in key))} {_number(value)}"
+            for key, value in values.items()
+            if value is not None
+        ]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"Duplicate metric {metric.name}")
+        self._metrics[metric.name] = metric
+
+    def render(self) -> bytes:
+        lines = []
+        for metric in self._metrics.values():
+            samples = metric.samples()
+            if not samples:
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(samples)
+        return ("\n".join(lines) + "\n").encode()
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
@@ -0,0 +1,6 @@
+-- Per-killmail item index used to link nested items in bulk.
+-- Existing rows keep item_index = 0; their parent_id is already set.
+ALTER TABLE killmail_items
+    ADD COLUMN item_index   SMALLINT UNSIGNED NOT NULL DEFAULT 0 AFTER parent_id,
+    ADD COLUMN parent_index SMALLINT UNSIGNED NULL AFTER item_index,
+    ADD INDEX idx_item_local (killmail_id, item_index);
@@ -0,0 +1,5 @@
+CREATE TABLE IF NOT EXISTS poller_checkpoints (
+    name        VARCHAR(64)     NOT NULL PRIMARY KEY,
+    sequence_id BIGINT UNSIGNED NOT NULL,
+    updated_at  DATETIME        NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
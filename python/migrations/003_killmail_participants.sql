@@ -0,0 +1,46 @@
+-- Participant index for entity filters on /kills, plus a backfill of
+-- existing killmails. SET columns OR together as bitmasks: victim = 1, attacker = 2.
+CREATE TABLE IF NOT EXISTS killmail_participants (
+    entity_type   ENUM('character', 'corporation', 'alliance') NOT NULL,
+    entity_id     INT UNSIGNED    NOT NULL,
+    killmail_time DATETIME        NOT NULL,
+    killmail_id   BIGINT UNSIGNED NOT NULL,
+    role          SET('victim', 'attacker') NOT NULL,
+
+    PRIMARY KEY (entity_type, entity_id, killmail_time, killmail_id),
+    INDEX idx_participant_killmail (killmail_id),
+    CONSTRAINT fk_participant_killmail FOREIGN KEY (killmail_id) REFERENCES killmails(killmail_id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+INSERT INTO killmail_participants (entity_type, entity_id, killmail_time, killmail_id, role)
+SELECT 'character', victim_character_id, killmail_time, killmail_id, 'victim'
+FROM killmails WHERE victim_character_id IS NOT NULL
+ON DUPLICATE KEY UPDATE role = role | 1;
+
+INSERT INTO killmail_participants (entity_type, entity_id, killmail_time, killmail_id, role)
+SELECT DISTINCT 'character', a.character_id, k.killmail_time, k.killmail_id, 'attacker'
+FROM killmail_attackers a JOIN killmails k ON k.killmail_id = a.killmail_id
+WHERE a.character_id IS NOT NULL
+ON DUPLICATE KEY UPDATE role = role | 2;
+
+INSERT INTO killmail_participants (entity_type, entity_id, killmail_time, killmail_id, role)
+SELECT 'corporation', victim_corporation_id, killmail_time, killmail_id, 'victim'
+FROM killmails WHERE victim_corporation_id IS NOT NULL
+ON DUPLICATE KEY UPDATE role = role | 1;
+
+INSERT INTO killmail_participants (entity_type, entity_id, killmail_time, killmail_id, role)
+SELECT DISTINCT 'corporation', a.corporation_id, k.killmail_time, k.killmail_id, 'attacker'
+FROM killmail_attackers a JOIN killmails k ON k.killmail_id = a.killmail_id
+WHERE a.corporation_id IS NOT NULL
+ON DUPLICATE KEY UPDATE role = role | 2;
+
+INSERT INTO killmail_participants (entity_type, entity_id, killmail_time, killmail_id, role)
+SELECT 'alliance', victim_alliance_id, killmail_time, killmail_id, 'victim'
+FROM killmails WHERE victim_alliance_id IS NOT NULL
+ON DUPLICATE KEY UPDATE role = role | 1;
+
+INSERT INTO killmail_participants (entity_type, entity_id, killmail_time, killmail_id, role)
+SELECT DISTINCT 'alliance', a.alliance_id, k.killmail_time, k.killmail_id, 'attacker'
+FROM killmail_attackers a JOIN killmails k ON k.killmail_id = a.killmail_id
+WHERE a.alliance_id IS NOT NULL
+ON DUPLICATE KEY UPDATE role = role | 2;
@@ -0,0 +1,46 @@
+-- Hourly rollups behind GET /stats, backfilled from existing killmails.
+CREATE TABLE IF NOT EXISTS killmail_stats_hourly (
+    dimension    ENUM('all', 'ship', 'system', 'alliance') NOT NULL,
+    dimension_id INT UNSIGNED    NOT NULL,
+    bucket       DATETIME        NOT NULL,
+    kills        INT UNSIGNED    NOT NULL DEFAULT 0,
+    total_value  DECIMAL(24,2)   NOT NULL DEFAULT 0,
+    kills_npc    INT UNSIGNED    NOT NULL DEFAULT 0,
+    kills_solo   INT UNSIGNED    NOT NULL DEFAULT 0,
+    kills_awox   INT UNSIGNED    NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (dimension, dimension_id, bucket),
+    INDEX idx_stats_bucket (dimension, bucket)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+INSERT INTO killmail_stats_hourly (
+    dimension, dimension_id, bucket, kills, total_value, kills_npc, kills_solo, kills_awox
+)
+SELECT 'all', 0, DATE_FORMAT(killmail_time, '%Y-%m-%d %H:00:00') AS bucket,
+    COUNT(*), SUM(zkb_total_value), SUM(zkb_is_npc), SUM(zkb_is_solo), SUM(zkb_is_awox)
+FROM killmails
+GROUP BY bucket;
+
+INSERT INTO killmail_stats_hourly (
+    dimension, dimension_id, bucket, kills, total_value, kills_npc, kills_solo, kills_awox
+)
+SELECT 'ship', victim_ship_type_id, DATE_FORMAT(killmail_time, '%Y-%m-%d %H:00:00') AS bucket,
+    COUNT(*), SUM(zkb_total_value), SUM(zkb_is_npc), SUM(zkb_is_solo), SUM(zkb_is_awox)
+FROM killmails
+GROUP BY victim_ship_type_id, bucket;
+
+INSERT INTO killmail_stats_hourly (
+    dimension, dimension_id, bucket, kills, total_value, kills_npc, kills_solo, kills_awox
+)
+SELECT 'system', solar_system_id, DATE_FORMAT(killmail_time, '%Y-%m-%d %H:00:00') AS bucket,
+    COUNT(*), SUM(zkb_total_value), SUM(zkb_is_npc), SUM(zkb_is_solo), SUM(zkb_is_awox)
+FROM killmails
+GROUP BY solar_system_id, bucket;
+
+INSERT INTO killmail_stats_hourly (
+    dimension, dimension_id, bucket, kills, total_value, kills_npc, kills_solo, kills_awox
+)
+SELECT 'alliance', victim_alliance_id, DATE_FORMAT(killmail_time, '%Y-%m-%d %H:00:00') AS bucket,
+    COUNT(*), SUM(zkb_total_value), SUM(zkb_is_npc), SUM(zkb_is_solo), SUM(zkb_is_awox)
+FROM killmails WHERE victim_alliance_id IS NOT NULL
+GROUP BY victim_alliance_id, bucket;
@@ -68,8 +68,10 @@ class KillmailDetail(KillmailSummary):
 
 
 class KillmailListResponse(BaseModel):
-    total: int
+    total: int | None
+    total_estimated: bool = False
     kills: list[KillmailSummary]
+    next_cursor: str | None = None
 
 
 class StatsResponse(BaseModel):
@@ -80,6 +82,7 @@ class StatsResponse(BaseModel):
     kills_awox: int
     top_ships: list[dict]
     top_solar_systems: list[dict]
+    top_alliances: list[dict]
 
 
 ItemResponse.model_rebuild()
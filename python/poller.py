@@ -1,16 +1,102 @@
+import asyncio
+import inspect
+import json
 import logging
-import os
-import tempfile
 import threading
 import time
-from pathlib import Path
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
 
 import httpx
 
-from filters import FilterPipeline
+from archive import SegmentArchive
+from checkpoint import CheckpointStore, FileCheckpointStore
+from filters import CompiledPipeline, FilterPipeline
+from metrics import Counter, Histogram
+
+# orjson is in requirements.txt and does most of the decoding work; the
+# stdlib fallback keeps the poller working without it, only slower.
+try:
+    import orjson
+
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
 
 logger = logging.getLogger(__name__)
 
+FETCH_SECONDS = Histogram(
+    "r2z2_fetch_seconds", "R2Z2 request latency, excluding rate-limit waits", ["endpoint"]
+)
+RESPONSES = Counter("r2z2_responses_total", "R2Z2 responses by status code", ["endpoint", "code"])
+
+_zkb_decoder = json.JSONDecoder()
+
+# Stands in for a killmail whose zkb envelope was already rejected by the
+# pipeline's prefilter, so the esi body was never decoded.
+PREFILTERED = object()
+
+
+def _peek_zkb(content: bytes) -> dict | None:
+    # zkb is a small object at the end of the payload; decode just that
+    # instead of the esi body with its attackers and items arrays.
+    idx = content.rfind(b'"zkb"')
+    if idx < 0:
+        return None
+    try:
+        # UnicodeDecodeError is a ValueError: a bad tail falls back to a
+        # full decode like any other unparseable zkb.
+        rest = content[idx + 5 :].decode()
+        colon = rest.find(":")
+        if colon < 0 or rest[:colon].strip():
+            return None
+        zkb, _ = _zkb_decoder.raw_decode(rest[colon + 1 :].lstrip())
+    except ValueError:
+        return None
+    return zkb if isinstance(zkb, dict) else None
+
+
+def _observe(path: str, status: int, seconds: float) -> None:
+    endpoint = "sequence" if path == "/sequence.json" else "killmail"
+    FETCH_SECONDS.labels(endpoint).observe(seconds)
+    RESPONSES.labels(endpoint, status).inc()
+
+
+def decode_killmail(content: bytes, filters=None):
+    if filters is not None and filters.has_prefilter:
+        zkb = _peek_zkb(content)
+        if zkb is not None and not filters.prefilter(zkb):
+            return PREFILTERED
+    return _loads(content)
+
+
+class RateLimiter:
+    """Token bucket shared by every request that counts against the R2Z2 quota."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token and return how long to wait before it may be spent."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self) -> None:
+        delay = self.reserve()
+        if delay:
+            time.sleep(delay)
+
+
+default_rate_limiter = RateLimiter(20)
+
 
 class ZKillboardR2Z2:
     BASE_URL = "https://r2z2.zkillboard.com/ephemeral"
@@ -22,13 +108,23 @@ class ZKillboardR2Z2:
     def __init__(
         self,
         state_file: str | None = None,
-        filters: FilterPipeline | None = None,
+        filters: FilterPipeline | CompiledPipeline | None = None,
         client: httpx.Client | None = None,
         shutdown_event: threading.Event | None = None,
+        rate_limiter: RateLimiter | None = None,
+        prefetch: int = 1,
+        checkpoint: CheckpointStore | None = None,
+        staged_decode: bool = True,
+        archive: SegmentArchive | None = None,
     ):
-        self.state_file = Path(state_file) if state_file else None
+        self.checkpoint = checkpoint or (FileCheckpointStore(state_file) if state_file else None)
         self.filters = filters
+        self.staged_decode = staged_decode
+        self.archive = archive
         self.shutdown_event = shutdown_event or threading.Event()
+        self.rate_limiter = rate_limiter or default_rate_limiter
+        self.prefetch = max(1, prefetch)
+        self._owns_client = client is None
         self.client = client or httpx.Client(
             base_url=self.BASE_URL,
             timeout=10.0,
@@ -37,46 +133,157 @@ class ZKillboardR2Z2:
                 "User-Agent": "R2Z2-Examples-Python/1.0",
             },
         )
-        self.last_sequence_id = 0
-        if self.state_file and self.state_file.exists():
-            self.last_sequence_id = int(self.state_file.read_text().strip())
+        self.last_sequence_id = self.checkpoint.load() if self.checkpoint else 0
+        # Sequences handled, whether or not their killmail passed the filters.
+        self.fetched = 0
+        # Newest sequence known to exist: from /sequence.json, or the one
+        # before the first 404 at the tail.
+        self.head_sequence_id = 0
+        self._flush = None
+
+    def close(self) -> None:
+        if self._owns_client:
+            self.client.close()
 
     def get_current_sequence(self) -> int:
-        data = self._request("/sequence.json")
+        data = _loads(self._request("/sequence.json"))
+        self.head_sequence_id = max(self.head_sequence_id, data["sequence_id"])
         return data["sequence_id"]
 
     def get_killmail(self, sequence_id: int) -> dict | None:
-        return self._request(f"/{sequence_id}.json", allow_not_found=True)
+        content = self._request(f"/{sequence_id}.json", allow_not_found=True)
+        if content is None:
+            return None
+        if self.archive is not None:
+            self.archive.append(sequence_id, content)
+        return decode_killmail(content, self.filters if self.staged_decode else None)
 
-    def poll(self, callback, start_from: int | None = None) -> None:
+    def poll(self, callback, start_from: int | None = None, flush=None) -> None:
+        # `flush`, if given, is called before each checkpoint commit so a
+        # buffering callback can persist everything the checkpoint covers.
         sequence_id = start_from or self.last_sequence_id or self.get_current_sequence()
-        logger.info("Poller starting at sequence %d", sequence_id)
+        logger.info("Poller starting at sequence %d (prefetch %d)", sequence_id, self.prefetch)
+
+        self._flush = flush
+        try:
+            if self.prefetch > 1:
+                self._poll_prefetch(callback, sequence_id)
+            else:
+                self._poll_sequential(callback, sequence_id)
+        finally:
+            self._commit()
 
+        logger.info("Poller stopped at sequence %d", self.last_sequence_id)
+
+    def replay(self, callback, start: int | None = None, end: int | None = None, flush=None) -> None:
+        # Feeds archived payloads in [start, end) through the same filters,
+        # callback and checkpoint as poll(), at disk speed and without
+        # touching the network. Defaults to resuming at the checkpoint.
+        start = start or self.last_sequence_id or None
+        logger.info("Replay starting at sequence %s", start or "the first archived")
+
+        self._flush = flush
+        replayed = skipped = 0
+        try:
+            for sequence_id in self.archive.sequences(start, end):
+                if self.shutdown_event.is_set():
+                    break
+                try:
+                    content = self.archive.get(sequence_id)
+                    killmail = decode_killmail(content, self.filters if self.staged_decode else None)
+                except (zlib.error, ValueError) as e:
+                    # A damaged record (orjson and json decode errors are
+                    # ValueErrors) is skipped, not fatal to the replay.
+                    logger.error("Skipping archived sequence %d: %s", sequence_id, e)
+                    skipped += 1
+                    continue
+                self._handle(callback, killmail, sequence_id)
+                replayed += 1
+        finally:
+            self._commit()
+
+        logger.info(
+            "Replay stopped at sequence %d (%d replayed, %d skipped)",
+            self.last_sequence_id, replayed, skipped,
+        )
+
+    def _poll_sequential(self, callback, sequence_id: int) -> None:
         while not self.shutdown_event.is_set():
             killmail = self.get_killmail(sequence_id)
 
             if killmail is None:
+                self.head_sequence_id = max(self.head_sequence_id, sequence_id - 1)
+                self._commit()
                 if self.shutdown_event.wait(self.SLEEP_ON_404):
                     break
                 continue
 
-            if self.filters is None or self.filters.evaluate(killmail):
-                callback(killmail, sequence_id)
-
-            self.last_sequence_id = sequence_id
-            self._save_state()
+            self._handle(callback, killmail, sequence_id)
             sequence_id += 1
             if self.shutdown_event.wait(self.SLEEP_ON_SUCCESS):
                 break
 
-        logger.info("Poller stopped at sequence %d", self.last_sequence_id)
+    def _poll_prefetch(self, callback, sequence_id: int) -> None:
+        # Keep up to `prefetch` sequences in flight; the rate limiter, not the
+        # round trip, bounds throughput. Results are consumed strictly in order
+        # so the checkpoint only ever moves past contiguous sequences.
+        pool = ThreadPoolExecutor(max_workers=self.prefetch, thread_name_prefix="r2z2-fetch")
+        pending: dict[int, Future] = {}
+        next_id = sequence_id
+        window = 1
+        try:
+            while not self.shutdown_event.is_set():
+                while next_id < sequence_id + window:
+                    pending[next_id] = pool.submit(self.get_killmail, next_id)
+                    next_id += 1
+
+                killmail = pending.pop(sequence_id).result()
 
-    def _request(self, path: str, allow_not_found: bool = False) -> dict | None:
+                if killmail is None:
+                    # Caught up with the tail: anything beyond is a 404 too.
+                    self.head_sequence_id = max(self.head_sequence_id, sequence_id - 1)
+                    for future in pending.values():
+                        future.cancel()
+                    pending.clear()
+                    next_id = sequence_id
+                    window = 1
+                    self._commit()
+                    if self.shutdown_event.wait(self.SLEEP_ON_404):
+                        break
+                    continue
+
+                self._handle(callback, killmail, sequence_id)
+                sequence_id += 1
+                window = min(self.prefetch, window * 2)
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def _handle(self, callback, killmail: dict, sequence_id: int) -> None:
+        self.fetched += 1
+        if killmail is not PREFILTERED and (
+            self.filters is None or self.filters.evaluate(killmail)
+        ):
+            callback(killmail, sequence_id)
+
+        self.last_sequence_id = sequence_id
+        if self.checkpoint and self.checkpoint.advance(sequence_id):
+            self._commit()
+
+    def _commit(self) -> None:
+        if self._flush is not None:
+            self._flush()
+        if self.checkpoint:
+            self.checkpoint.commit()
+
+    def _request(self, path: str, allow_not_found: bool = False) -> bytes | None:
         for attempt in range(self.MAX_RETRIES + 1):
             try:
+                self.rate_limiter.acquire()
+                started = time.monotonic()
                 response = self.client.get(path)
+                _observe(path, response.status_code, time.monotonic() - started)
                 response.raise_for_status()
-                return response.json()
+                return response.content
             except httpx.HTTPStatusError as e:
                 if e.response.status_code == 404 and allow_not_found:
                     return None
@@ -88,14 +295,151 @@ class ZKillboardR2Z2:
                     raise
                 raise
 
-    def _save_state(self) -> None:
-        if self.state_file:
-            fd, tmp_path = tempfile.mkstemp(dir=self.state_file.parent)
+
+class AsyncZKillboardR2Z2:
+    BASE_URL = ZKillboardR2Z2.BASE_URL
+    SLEEP_ON_SUCCESS = ZKillboardR2Z2.SLEEP_ON_SUCCESS
+    SLEEP_ON_404 = ZKillboardR2Z2.SLEEP_ON_404
+    SLEEP_ON_429 = ZKillboardR2Z2.SLEEP_ON_429
+    MAX_RETRIES = ZKillboardR2Z2.MAX_RETRIES
+
+    def __init__(
+        self,
+        state_file: str | None = None,
+        filters: FilterPipeline | CompiledPipeline | None = None,
+        client: httpx.AsyncClient | None = None,
+        shutdown_event: asyncio.Event | None = None,
+        rate_limiter: RateLimiter | None = None,
+        prefetch: int = 1,
+        checkpoint: CheckpointStore | None = None,
+        staged_decode: bool = True,
+        prefilter: FilterPipeline | CompiledPipeline | None = None,
+        archive: SegmentArchive | None = None,
+    ):
+        # `prefilter` supplies the ZKB_ONLY filters applied while decoding
+        # (defaults to `filters`), for callers that evaluate the full
+        # pipeline themselves and pass filters=None.
+        self.checkpoint = checkpoint or (FileCheckpointStore(state_file) if state_file else None)
+        self.filters = filters
+        self.prefilter = prefilter if prefilter is not None else filters
+        self.staged_decode = staged_decode
+        self.archive = archive
+        self.shutdown_event = shutdown_event or asyncio.Event()
+        self.rate_limiter = rate_limiter or default_rate_limiter
+        self.prefetch = max(1, prefetch)
+        self._owns_client = client is None
+        self.client = client or httpx.AsyncClient(
+            base_url=self.BASE_URL,
+            timeout=10.0,
+            headers={
+                "Accept": "application/json",
+                "User-Agent": "R2Z2-Examples-Python/1.0",
+            },
+        )
+        self.last_sequence_id = self.checkpoint.load() if self.checkpoint else 0
+        self.fetched = 0
+        self.head_sequence_id = 0
+
+    async def aclose(self) -> None:
+        if self._owns_client:
+            await self.client.aclose()
+
+    async def get_current_sequence(self) -> int:
+        data = _loads(await self._request("/sequence.json"))
+        self.head_sequence_id = max(self.head_sequence_id, data["sequence_id"])
+        return data["sequence_id"]
+
+    async def get_killmail(self, sequence_id: int) -> dict | None:
+        content = await self._request(f"/{sequence_id}.json", allow_not_found=True)
+        if content is None:
+            return None
+        if self.archive is not None:
+            # Compression and file writes stay off the event loop.
+            await asyncio.to_thread(self.archive.append, sequence_id, content)
+        return decode_killmail(content, self.prefilter if self.staged_decode else None)
+
+    async def poll(self, callback, start_from: int | None = None, flush=None) -> None:
+        sequence_id = start_from or self.last_sequence_id or await self.get_current_sequence()
+        logger.info("Poller starting at sequence %d (prefetch %d)", sequence_id, self.prefetch)
+
+        pending: dict[int, asyncio.Task] = {}
+        next_id = sequence_id
+        window = 1
+        try:
+            while not self.shutdown_event.is_set():
+                while next_id < sequence_id + window:
+                    pending[next_id] = asyncio.create_task(self.get_killmail(next_id))
+                    next_id += 1
+
+                killmail = await pending.pop(sequence_id)
+
+                if killmail is None:
+                    self.head_sequence_id = max(self.head_sequence_id, sequence_id - 1)
+                    for task in pending.values():
+                        task.cancel()
+                    pending.clear()
+                    next_id = sequence_id
+                    window = 1
+                    await self._commit(flush)
+                    if await self._wait(self.SLEEP_ON_404):
+                        break
+                    continue
+
+                await self._handle(callback, killmail, sequence_id, flush)
+                sequence_id += 1
+                window = min(self.prefetch, window * 2)
+                if self.prefetch == 1 and await self._wait(self.SLEEP_ON_SUCCESS):
+                    break
+        finally:
+            for task in pending.values():
+                task.cancel()
+            await self._commit(flush)
+
+        logger.info("Poller stopped at sequence %d", self.last_sequence_id)
+
+    async def _handle(self, callback, killmail: dict, sequence_id: int, flush) -> None:
+        self.fetched += 1
+        if killmail is not PREFILTERED and (
+            self.filters is None or await self.filters.evaluate_async(killmail)
+        ):
+            result = callback(killmail, sequence_id)
+            if inspect.isawaitable(result):
+                await result
+
+        self.last_sequence_id = sequence_id
+        if self.checkpoint and self.checkpoint.advance(sequence_id):
+            await self._commit(flush)
+
+    async def _commit(self, flush) -> None:
+        if flush is not None:
+            await flush()
+        if self.checkpoint:
+            await asyncio.to_thread(self.checkpoint.commit)
+
+    async def _wait(self, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(self.shutdown_event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def _request(self, path: str, allow_not_found: bool = False) -> bytes | None:
+        for attempt in range(self.MAX_RETRIES + 1):
             try:
-                with os.fdopen(fd, "w") as f:
-                    f.write(str(self.last_sequence_id))
-                os.replace(tmp_path, self.state_file)
-            except BaseException:
-                if os.path.exists(tmp_path):
-                    os.unlink(tmp_path)
+                await asyncio.sleep(self.rate_limiter.reserve())
+                started = time.monotonic()
+                response = await self.client.get(path)
+                _observe(path, response.status_code, time.monotonic() - started)
+                response.raise_for_status()
+                return response.content
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code == 404 and allow_not_found:
+                    return None
+                if e.response.status_code == 429:
+                    if attempt < self.MAX_RETRIES:
+                        logger.warning("Rate limited (429), retry %d/%d", attempt + 1, self.MAX_RETRIES)
+                        await asyncio.sleep(self.SLEEP_ON_429)
+                        continue
+                    raise
                 raise
+
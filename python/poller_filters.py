@@ -0,0 +1,17 @@
+from config import settings
+from filters import FilterPipeline
+from filters.level1 import NpcFilter, SecurityFilter
+from filters.level2 import MinValueFilter
+
+
+def build_pipeline() -> FilterPipeline:
+    # The filters configured by the POLLER_* settings, shared by the live
+    # poller, backfills and archive replays.
+    pipeline = FilterPipeline()
+    if settings.poller_exclude_npc:
+        pipeline.add_level1(NpcFilter(exclude=True))
+    if settings.poller_security_zones:
+        pipeline.add_level1(SecurityFilter(allow=settings.poller_security_zones))
+    if settings.poller_min_value:
+        pipeline.add_level2(MinValueFilter(settings.poller_min_value))
+    return pipeline
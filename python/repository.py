@@ -1,9 +1,165 @@
+import base64
 import json
-from datetime import datetime, timezone
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, Literal
 
-from sqlalchemy import text
+from sqlalchemy import bindparam, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from cache import TTLCache
+from config import settings
+from metrics import Counter, Histogram
+
+CountStrategy = Literal["exact", "estimate", "cached", "none"]
+
+# Totals per normalized filter set. Only the TTL expires them: with the
+# poller storing kills every few seconds, clearing on each save would
+# leave the "cached" strategy with nothing to reuse.
+totals_cache = TTLCache(settings.count_cache_ttl)
+
+SAVE_SECONDS = Histogram("repository_save_seconds", "save_many latency per batch, commit included")
+KILLS_SAVED = Counter("repository_killmails_saved_total", "Killmails inserted")
+ROWS_WRITTEN = Counter("repository_rows_written_total", "Rows inserted by save_many", ["table"])
+ROWS_PER_KILL = Histogram(
+    "repository_rows_per_kill",
+    "Rows inserted per killmail (killmail, attackers, items, participants)",
+    buckets=(10, 25, 50, 100, 250, 500, 1000, 2500, 5000),
+)
+
+# Deadlocks (1213) and lock wait timeouts (1205) roll the transaction
+# back; save_many retries the whole batch.
+_RETRYABLE_ERRORS = (1213, 1205)
+SAVE_ATTEMPTS = 3
+
+_INSERT_KILLMAIL = text("""
+    INSERT IGNORE INTO killmails (
+        killmail_id, hash, killmail_time, solar_system_id, sequence_id,
+        war_id, moon_id,
+        victim_character_id, victim_corporation_id, victim_alliance_id,
+        victim_faction_id, victim_ship_type_id, victim_damage_taken,
+        victim_pos_x, victim_pos_y, victim_pos_z,
+        zkb_location_id, zkb_fitted_value, zkb_dropped_value,
+        zkb_destroyed_value, zkb_total_value, zkb_points,
+        zkb_is_npc, zkb_is_solo, zkb_is_awox,
+        zkb_labels, zkb_href, zkb_attacker_count, uploaded_at
+    ) VALUES (
+        :killmail_id, :hash, :killmail_time, :solar_system_id, :sequence_id,
+        :war_id, :moon_id,
+        :victim_character_id, :victim_corporation_id, :victim_alliance_id,
+        :victim_faction_id, :victim_ship_type_id, :victim_damage_taken,
+        :victim_pos_x, :victim_pos_y, :victim_pos_z,
+        :zkb_location_id, :zkb_fitted_value, :zkb_dropped_value,
+        :zkb_destroyed_value, :zkb_total_value, :zkb_points,
+        :zkb_is_npc, :zkb_is_solo, :zkb_is_awox,
+        :zkb_labels, :zkb_href, :zkb_attacker_count, :uploaded_at
+    )
+""")
+
+_INSERT_ATTACKER = text("""
+    INSERT INTO killmail_attackers (
+        killmail_id, character_id, corporation_id, alliance_id, faction_id,
+        ship_type_id, weapon_type_id, damage_done, final_blow, security_status
+    ) VALUES (
+        :killmail_id, :character_id, :corporation_id, :alliance_id, :faction_id,
+        :ship_type_id, :weapon_type_id, :damage_done, :final_blow, :security_status
+    )
+""")
+
+_INSERT_ITEM = text("""
+    INSERT INTO killmail_items (
+        killmail_id, item_index, parent_index, item_type_id, flag,
+        quantity_destroyed, quantity_dropped, singleton
+    ) VALUES (
+        :killmail_id, :item_index, :parent_index, :item_type_id, :flag,
+        :quantity_destroyed, :quantity_dropped, :singleton
+    )
+""")
+
+# Items are inserted flat with a per-killmail index; container links are
+# resolved afterwards in one statement instead of reading lastrowid per row.
+_LINK_ITEM_PARENTS = text("""
+    UPDATE killmail_items c
+    JOIN killmail_items p
+        ON p.killmail_id = c.killmail_id AND p.item_index = c.parent_index
+    SET c.parent_id = p.id
+    WHERE c.killmail_id IN :ids AND c.parent_index IS NOT NULL
+""").bindparams(bindparam("ids", expanding=True))
+
+_INSERT_PARTICIPANT = text("""
+    INSERT INTO killmail_participants (entity_type, entity_id, killmail_time, killmail_id, role)
+    VALUES (:entity_type, :entity_id, :killmail_time, :killmail_id, :role)
+""")
+
+_UPSERT_ROLLUP = text("""
+    INSERT INTO killmail_stats_hourly (
+        dimension, dimension_id, bucket, kills, total_value, kills_npc, kills_solo, kills_awox
+    ) VALUES (
+        :dimension, :dimension_id, :bucket, :kills, :total_value, :kills_npc, :kills_solo, :kills_awox
+    )
+    ON DUPLICATE KEY UPDATE
+        kills = kills + VALUES(kills),
+        total_value = total_value + VALUES(total_value),
+        kills_npc = kills_npc + VALUES(kills_npc),
+        kills_solo = kills_solo + VALUES(kills_solo),
+        kills_awox = kills_awox + VALUES(kills_awox)
+""")
+
+_ATTACKERS_JSON = """
+    SELECT JSON_ARRAYAGG(JSON_OBJECT(
+        'id', a.id, 'killmail_id', a.killmail_id, 'character_id', a.character_id,
+        'corporation_id', a.corporation_id, 'alliance_id', a.alliance_id,
+        'faction_id', a.faction_id, 'ship_type_id', a.ship_type_id,
+        'weapon_type_id', a.weapon_type_id, 'damage_done', a.damage_done,
+        'final_blow', a.final_blow, 'security_status', a.security_status
+    )) FROM killmail_attackers a WHERE a.killmail_id = k.killmail_id
+"""
+
+_ITEMS_JSON = """
+    SELECT JSON_ARRAYAGG(JSON_OBJECT(
+        'id', i.id, 'parent_id', i.parent_id, 'item_type_id', i.item_type_id,
+        'flag', i.flag, 'quantity_destroyed', i.quantity_destroyed,
+        'quantity_dropped', i.quantity_dropped, 'singleton', i.singleton
+    )) FROM killmail_items i WHERE i.killmail_id = k.killmail_id
+"""
+
+_UPSERT_CHECKPOINT = text("""
+    INSERT INTO poller_checkpoints (name, sequence_id) VALUES (:name, :sequence_id)
+    ON DUPLICATE KEY UPDATE sequence_id = GREATEST(sequence_id, VALUES(sequence_id))
+""")
+
+
+# Columns of a KillmailSummary, in the order list_kills(raw=True) returns them.
+SUMMARY_COLUMNS = (
+    "killmail_id", "killmail_time", "solar_system_id", "victim_ship_type_id",
+    "victim_character_id", "victim_corporation_id", "victim_alliance_id",
+    "zkb_total_value", "zkb_is_npc", "zkb_is_solo", "zkb_is_awox", "zkb_attacker_count",
+)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class _ConcurrentInsert(Exception):
+    pass
+
+
+def encode_cursor(killmail_time: datetime, killmail_id: int) -> str:
+    raw = f"{killmail_time.isoformat()}|{killmail_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        killmail_time, killmail_id = raw.split("|")
+        return datetime.fromisoformat(killmail_time), int(killmail_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor(cursor) from e
+
 
 class KillmailRepository:
     def __init__(self, session: Session):
@@ -14,135 +170,279 @@ class KillmailRepository:
     def save(self, killmail: dict) -> bool:
         killmail_id = killmail["killmail_id"]
         esi = killmail["esi"]
-        zkb = killmail["zkb"]
-        victim = esi["victim"]
-        position = victim.get("position") or {}
 
-        result = self.session.execute(
-            text("""
-                INSERT IGNORE INTO killmails (
-                    killmail_id, hash, killmail_time, solar_system_id, sequence_id,
-                    war_id, moon_id,
-                    victim_character_id, victim_corporation_id, victim_alliance_id,
-                    victim_faction_id, victim_ship_type_id, victim_damage_taken,
-                    victim_pos_x, victim_pos_y, victim_pos_z,
-                    zkb_location_id, zkb_fitted_value, zkb_dropped_value,
-                    zkb_destroyed_value, zkb_total_value, zkb_points,
-                    zkb_is_npc, zkb_is_solo, zkb_is_awox,
-                    zkb_labels, zkb_href, zkb_attacker_count, uploaded_at
-                ) VALUES (
-                    :killmail_id, :hash, :killmail_time, :solar_system_id, :sequence_id,
-                    :war_id, :moon_id,
-                    :victim_character_id, :victim_corporation_id, :victim_alliance_id,
-                    :victim_faction_id, :victim_ship_type_id, :victim_damage_taken,
-                    :victim_pos_x, :victim_pos_y, :victim_pos_z,
-                    :zkb_location_id, :zkb_fitted_value, :zkb_dropped_value,
-                    :zkb_destroyed_value, :zkb_total_value, :zkb_points,
-                    :zkb_is_npc, :zkb_is_solo, :zkb_is_awox,
-                    :zkb_labels, :zkb_href, :zkb_attacker_count, :uploaded_at
-                )
-            """),
-            {
-                "killmail_id": killmail_id,
-                "hash": killmail["hash"],
-                "killmail_time": esi["killmail_time"],
-                "solar_system_id": esi["solar_system_id"],
-                "sequence_id": killmail["sequence_id"],
-                "war_id": esi.get("war_id"),
-                "moon_id": esi.get("moon_id"),
-                "victim_character_id": victim.get("character_id"),
-                "victim_corporation_id": victim.get("corporation_id"),
-                "victim_alliance_id": victim.get("alliance_id"),
-                "victim_faction_id": victim.get("faction_id"),
-                "victim_ship_type_id": victim["ship_type_id"],
-                "victim_damage_taken": victim["damage_taken"],
-                "victim_pos_x": position.get("x"),
-                "victim_pos_y": position.get("y"),
-                "victim_pos_z": position.get("z"),
-                "zkb_location_id": zkb.get("locationID"),
-                "zkb_fitted_value": zkb.get("fittedValue", 0),
-                "zkb_dropped_value": zkb.get("droppedValue", 0),
-                "zkb_destroyed_value": zkb.get("destroyedValue", 0),
-                "zkb_total_value": zkb.get("totalValue", 0),
-                "zkb_points": zkb.get("points", 0),
-                "zkb_is_npc": int(zkb.get("npc", False)),
-                "zkb_is_solo": int(zkb.get("solo", False)),
-                "zkb_is_awox": int(zkb.get("awox", False)),
-                "zkb_labels": json.dumps(zkb.get("labels", [])),
-                "zkb_href": zkb.get("href"),
-                "zkb_attacker_count": len(esi.get("attackers", [])),
-                "uploaded_at": datetime.fromtimestamp(
-                    killmail["uploaded_at"], tz=timezone.utc
-                ).strftime("%Y-%m-%d %H:%M:%S"),
-            },
-        )
+        result = self.session.execute(_INSERT_KILLMAIL, self._killmail_params(killmail))
 
         if result.rowcount == 0:
             self.session.rollback()
             return False
 
         self._insert_attackers(killmail_id, esi.get("attackers", []))
-        self._insert_items(killmail_id, victim.get("items", []))
+        self._insert_items([killmail])
+        self._insert_participants([killmail])
+        self._update_rollups([killmail])
         self.session.commit()
         return True
 
-    def _insert_attackers(self, killmail_id: int, attackers: list[dict]) -> None:
-        if not attackers:
-            return
-        for attacker in attackers:
-            self.session.execute(
-                text("""
-                    INSERT INTO killmail_attackers (
-                        killmail_id, character_id, corporation_id, alliance_id, faction_id,
-                        ship_type_id, weapon_type_id, damage_done, final_blow, security_status
-                    ) VALUES (
-                        :killmail_id, :character_id, :corporation_id, :alliance_id, :faction_id,
-                        :ship_type_id, :weapon_type_id, :damage_done, :final_blow, :security_status
-                    )
-                """),
-                {
-                    "killmail_id": killmail_id,
-                    "character_id": attacker.get("character_id"),
-                    "corporation_id": attacker.get("corporation_id"),
-                    "alliance_id": attacker.get("alliance_id"),
-                    "faction_id": attacker.get("faction_id"),
-                    "ship_type_id": attacker.get("ship_type_id"),
-                    "weapon_type_id": attacker.get("weapon_type_id"),
-                    "damage_done": attacker.get("damage_done", 0),
-                    "final_blow": int(attacker.get("final_blow", False)),
-                    "security_status": attacker.get("security_status", 0),
-                },
+    def save_many(
+        self, killmails: list[dict], checkpoint: tuple[str, int] | None = None
+    ) -> int:
+        for attempt in range(SAVE_ATTEMPTS):
+            try:
+                return self._save_many(killmails, checkpoint)
+            except _ConcurrentInsert:
+                self.session.rollback()
+            except OperationalError as e:
+                self.session.rollback()
+                code = e.orig.args[0] if e.orig is not None and e.orig.args else None
+                if code not in _RETRYABLE_ERRORS or attempt == SAVE_ATTEMPTS - 1:
+                    raise
+        raise RuntimeError(f"Killmails kept being inserted concurrently after {SAVE_ATTEMPTS} attempts")
+
+    def _save_many(self, killmails: list[dict], checkpoint: tuple[str, int] | None) -> int:
+        started = time.monotonic()
+        batch = {k["killmail_id"]: k for k in killmails}
+        if checkpoint is not None:
+            name, sequence_id = checkpoint
+            self.session.execute(_UPSERT_CHECKPOINT, {"name": name, "sequence_id": sequence_id})
+        if not batch:
+            self.session.commit()
+            return 0
+
+        # A plain read takes no locks; a killmail another writer inserts in
+        # the meantime shows up as a short INSERT IGNORE rowcount below.
+        existing = {
+            r[0]
+            for r in self.session.execute(
+                text("SELECT killmail_id FROM killmails WHERE killmail_id IN :ids").bindparams(
+                    bindparam("ids", expanding=True)
+                ),
+                {"ids": list(batch)},
             )
+        }
+        # Inserting in key order keeps two overlapping batches from
+        # waiting on each other's rows in opposite orders.
+        new = [batch[killmail_id] for killmail_id in sorted(batch) if killmail_id not in existing]
+        if not new:
+            self.session.commit()
+            return 0
 
-    def _insert_items(
-        self, killmail_id: int, items: list[dict], parent_id: int | None = None
+        result = self.session.execute(_INSERT_KILLMAIL, [self._killmail_params(k) for k in new])
+        if result.rowcount != len(new):
+            raise _ConcurrentInsert()
+        attackers = [
+            self._attacker_params(k["killmail_id"], attacker)
+            for k in new
+            for attacker in k["esi"].get("attackers", [])
+        ]
+        if attackers:
+            self.session.execute(_INSERT_ATTACKER, attackers)
+        items = self._insert_items(new)
+        participants = self._insert_participants(new)
+        self._update_rollups(new)
+        self.session.commit()
+        self._record_save(new, attackers, items, participants, time.monotonic() - started)
+        return len(new)
+
+    @staticmethod
+    def _record_save(
+        new: list[dict], attackers: list[dict], items: list[dict], participants: list[dict], seconds: float
     ) -> None:
-        if not items:
-            return
-        for item in items:
-            result = self.session.execute(
-                text("""
-                    INSERT INTO killmail_items (
-                        killmail_id, parent_id, item_type_id, flag,
-                        quantity_destroyed, quantity_dropped, singleton
-                    ) VALUES (
-                        :killmail_id, :parent_id, :item_type_id, :flag,
-                        :quantity_destroyed, :quantity_dropped, :singleton
-                    )
-                """),
-                {
-                    "killmail_id": killmail_id,
-                    "parent_id": parent_id,
-                    "item_type_id": item["item_type_id"],
-                    "flag": item.get("flag", 0),
-                    "quantity_destroyed": item.get("quantity_destroyed", 0),
-                    "quantity_dropped": item.get("quantity_dropped", 0),
-                    "singleton": item.get("singleton", 0),
-                },
+        SAVE_SECONDS.observe(seconds)
+        KILLS_SAVED.inc(len(new))
+        rows = {k["killmail_id"]: 1 for k in new}
+        for table, table_rows in (
+            ("killmail_attackers", attackers),
+            ("killmail_items", items),
+            ("killmail_participants", participants),
+        ):
+            ROWS_WRITTEN.labels(table).inc(len(table_rows))
+            for row in table_rows:
+                rows[row["killmail_id"]] += 1
+        ROWS_WRITTEN.labels("killmails").inc(len(new))
+        for count in rows.values():
+            ROWS_PER_KILL.observe(count)
+
+    def load_checkpoint(self, name: str) -> int:
+        sequence_id = self.session.execute(
+            text("SELECT sequence_id FROM poller_checkpoints WHERE name = :name"),
+            {"name": name},
+        ).scalar()
+        return sequence_id or 0
+
+    def save_checkpoint(self, name: str, sequence_id: int) -> None:
+        self.session.execute(_UPSERT_CHECKPOINT, {"name": name, "sequence_id": sequence_id})
+        self.session.commit()
+
+    @staticmethod
+    def _killmail_params(killmail: dict) -> dict:
+        esi = killmail["esi"]
+        zkb = killmail["zkb"]
+        victim = esi["victim"]
+        position = victim.get("position") or {}
+        return {
+            "killmail_id": killmail["killmail_id"],
+            "hash": killmail["hash"],
+            "killmail_time": esi["killmail_time"],
+            "solar_system_id": esi["solar_system_id"],
+            "sequence_id": killmail["sequence_id"],
+            "war_id": esi.get("war_id"),
+            "moon_id": esi.get("moon_id"),
+            "victim_character_id": victim.get("character_id"),
+            "victim_corporation_id": victim.get("corporation_id"),
+            "victim_alliance_id": victim.get("alliance_id"),
+            "victim_faction_id": victim.get("faction_id"),
+            "victim_ship_type_id": victim["ship_type_id"],
+            "victim_damage_taken": victim["damage_taken"],
+            "victim_pos_x": position.get("x"),
+            "victim_pos_y": position.get("y"),
+            "victim_pos_z": position.get("z"),
+            "zkb_location_id": zkb.get("locationID"),
+            "zkb_fitted_value": zkb.get("fittedValue", 0),
+            "zkb_dropped_value": zkb.get("droppedValue", 0),
+            "zkb_destroyed_value": zkb.get("destroyedValue", 0),
+            "zkb_total_value": zkb.get("totalValue", 0),
+            "zkb_points": zkb.get("points", 0),
+            "zkb_is_npc": int(zkb.get("npc", False)),
+            "zkb_is_solo": int(zkb.get("solo", False)),
+            "zkb_is_awox": int(zkb.get("awox", False)),
+            "zkb_labels": json.dumps(zkb.get("labels", [])),
+            "zkb_href": zkb.get("href"),
+            "zkb_attacker_count": len(esi.get("attackers", [])),
+            "uploaded_at": datetime.fromtimestamp(
+                killmail["uploaded_at"], tz=timezone.utc
+            ).strftime("%Y-%m-%d %H:%M:%S"),
+        }
+
+    @staticmethod
+    def _attacker_params(killmail_id: int, attacker: dict) -> dict:
+        return {
+            "killmail_id": killmail_id,
+            "character_id": attacker.get("character_id"),
+            "corporation_id": attacker.get("corporation_id"),
+            "alliance_id": attacker.get("alliance_id"),
+            "faction_id": attacker.get("faction_id"),
+            "ship_type_id": attacker.get("ship_type_id"),
+            "weapon_type_id": attacker.get("weapon_type_id"),
+            "damage_done": attacker.get("damage_done", 0),
+            "final_blow": int(attacker.get("final_blow", False)),
+            "security_status": attacker.get("security_status", 0),
+        }
+
+    @staticmethod
+    def _item_rows(killmail_id: int, items: list[dict]) -> list[dict]:
+        rows: list[dict] = []
+        stack: list[tuple[dict, int | None]] = [(item, None) for item in reversed(items)]
+        while stack:
+            item, parent_index = stack.pop()
+            rows.append({
+                "killmail_id": killmail_id,
+                "item_index": len(rows),
+                "parent_index": parent_index,
+                "item_type_id": item["item_type_id"],
+                "flag": item.get("flag", 0),
+                "quantity_destroyed": item.get("quantity_destroyed", 0),
+                "quantity_dropped": item.get("quantity_dropped", 0),
+                "singleton": item.get("singleton", 0),
+            })
+            for child in reversed(item.get("items") or []):
+                stack.append((child, len(rows) - 1))
+        return rows
+
+    @staticmethod
+    def _participant_rows(killmail: dict) -> list[dict]:
+        esi = killmail["esi"]
+        roles: dict[tuple[str, int], set[str]] = {}
+        for role, people in (("victim", [esi["victim"]]), ("attacker", esi.get("attackers", []))):
+            for person in people:
+                for entity_type in ("character", "corporation", "alliance"):
+                    entity_id = person.get(f"{entity_type}_id")
+                    if entity_id is not None:
+                        roles.setdefault((entity_type, entity_id), set()).add(role)
+        return [
+            {
+                "entity_type": entity_type,
+                "entity_id": entity_id,
+                "killmail_time": esi["killmail_time"],
+                "killmail_id": killmail["killmail_id"],
+                "role": ",".join(sorted(role)),
+            }
+            for (entity_type, entity_id), role in roles.items()
+        ]
+
+    def _insert_participants(self, killmails: list[dict]) -> list[dict]:
+        rows = [row for k in killmails for row in self._participant_rows(k)]
+        if rows:
+            self.session.execute(_INSERT_PARTICIPANT, rows)
+        return rows
+
+    def _update_rollups(self, killmails: list[dict]) -> None:
+        totals: dict[tuple[str, int, str], list] = {}
+        for k in killmails:
+            esi = k["esi"]
+            zkb = k["zkb"]
+            victim = esi["victim"]
+            killmail_time = esi["killmail_time"]  # ESI format: 2024-01-31T12:34:56Z
+            bucket = f"{killmail_time[:10]} {killmail_time[11:13]}:00:00"
+            counts = (
+                1,
+                zkb.get("totalValue", 0),
+                int(bool(zkb.get("npc", False))),
+                int(bool(zkb.get("solo", False))),
+                int(bool(zkb.get("awox", False))),
             )
-            if item.get("items"):
-                inserted_id = result.lastrowid
-                self._insert_items(killmail_id, item["items"], inserted_id)
+            dimensions = [
+                ("all", 0),
+                ("ship", victim["ship_type_id"]),
+                ("system", esi["solar_system_id"]),
+            ]
+            if victim.get("alliance_id") is not None:
+                dimensions.append(("alliance", victim["alliance_id"]))
+            for dimension, dimension_id in dimensions:
+                acc = totals.setdefault((dimension, dimension_id, bucket), [0, 0, 0, 0, 0])
+                for i, n in enumerate(counts):
+                    acc[i] += n
+
+        # Sorted so concurrent writers lock rollup rows in the same order.
+        self.session.execute(
+            _UPSERT_ROLLUP,
+            [
+                {
+                    "dimension": dimension,
+                    "dimension_id": dimension_id,
+                    "bucket": bucket,
+                    "kills": kills,
+                    "total_value": value,
+                    "kills_npc": npc,
+                    "kills_solo": solo,
+                    "kills_awox": awox,
+                }
+                for (dimension, dimension_id, bucket), (kills, value, npc, solo, awox) in sorted(
+                    totals.items()
+                )
+            ],
+        )
+
+    def _insert_attackers(self, killmail_id: int, attackers: list[dict]) -> None:
+        if not attackers:
+            return
+        self.session.execute(
+            _INSERT_ATTACKER, [self._attacker_params(killmail_id, a) for a in attackers]
+        )
+
+    def _insert_items(self, killmails: list[dict]) -> list[dict]:
+        rows = [
+            row
+            for k in killmails
+            for row in self._item_rows(k["killmail_id"], k["esi"]["victim"].get("items", []))
+        ]
+        if not rows:
+            return rows
+        self.session.execute(_INSERT_ITEM, rows)
+        nested = {row["killmail_id"] for row in rows if row["parent_index"] is not None}
+        if nested:
+            self.session.execute(_LINK_ITEM_PARENTS, {"ids": list(nested)})
+        return rows
 
     # ── Read (API) ──────────────────────────────────────────────────
 
@@ -151,6 +451,62 @@ class KillmailRepository:
         *,
         limit: int = 50,
         offset: int = 0,
+        cursor: str | None = None,
+        count: CountStrategy = "exact",
+        raw: bool = False,
+        **filters,
+    ) -> dict:
+        # With raw=True only SUMMARY_COLUMNS are selected and kills are
+        # returned as plain tuples, for callers that encode rows directly.
+        source, where, params, time_col, id_col = self._kill_query(**filters)
+        total, total_estimated = self._count(source, where, params, count)
+
+        # Keyset pagination: continue strictly after the (time, id) of the
+        # previous page's last row, which the driving index serves directly.
+        page_where = where
+        page_params = {**params, "limit": limit, "offset": offset}
+        if cursor is not None:
+            cursor_time, cursor_id = decode_cursor(cursor)
+            page_where += (
+                f" AND ({time_col} < :cursor_time"
+                f" OR ({time_col} = :cursor_time AND {id_col} < :cursor_id))"
+            )
+            page_params["cursor_time"] = cursor_time
+            page_params["cursor_id"] = cursor_id
+
+        columns = ", ".join(f"k.{c}" for c in SUMMARY_COLUMNS) if raw else "k.*"
+        rows = self.session.execute(
+            text(
+                f"SELECT {columns} FROM {source} WHERE {page_where}"
+                f" ORDER BY {time_col} DESC, {id_col} DESC LIMIT :limit OFFSET :offset"
+            ),
+            page_params,
+        )
+
+        if raw:
+            kills = [tuple(r) for r in rows]
+        else:
+            kills = []
+            for r in rows:
+                row = dict(r._mapping)
+                row["zkb_labels"] = json.loads(row["zkb_labels"]) if row.get("zkb_labels") else []
+                kills.append(row)
+
+        next_cursor = None
+        if len(kills) == limit:
+            last = dict(zip(SUMMARY_COLUMNS, kills[-1])) if raw else kills[-1]
+            next_cursor = encode_cursor(last["killmail_time"], last["killmail_id"])
+
+        return {
+            "total": total,
+            "total_estimated": total_estimated,
+            "kills": kills,
+            "next_cursor": next_cursor,
+        }
+
+    @staticmethod
+    def _kill_query(
+        *,
         min_value: float | None = None,
         max_value: float | None = None,
         solar_system_id: int | None = None,
@@ -161,7 +517,7 @@ class KillmailRepository:
         npc: bool | None = None,
         solo: bool | None = None,
         awox: bool | None = None,
-    ) -> tuple[list[dict], int]:
+    ) -> tuple[str, str, dict, str, str]:
         clauses = []
         params: dict = {}
 
@@ -177,30 +533,6 @@ class KillmailRepository:
         if ship_type_id is not None:
             clauses.append("k.victim_ship_type_id = :ship_type_id")
             params["ship_type_id"] = ship_type_id
-        if character_id is not None:
-            clauses.append(
-                "(k.victim_character_id = :character_id"
-                " OR EXISTS (SELECT 1 FROM killmail_attackers a"
-                " WHERE a.killmail_id = k.killmail_id"
-                " AND a.character_id = :character_id))"
-            )
-            params["character_id"] = character_id
-        if corporation_id is not None:
-            clauses.append(
-                "(k.victim_corporation_id = :corporation_id"
-                " OR EXISTS (SELECT 1 FROM killmail_attackers a"
-                " WHERE a.killmail_id = k.killmail_id"
-                " AND a.corporation_id = :corporation_id))"
-            )
-            params["corporation_id"] = corporation_id
-        if alliance_id is not None:
-            clauses.append(
-                "(k.victim_alliance_id = :alliance_id"
-                " OR EXISTS (SELECT 1 FROM killmail_attackers a"
-                " WHERE a.killmail_id = k.killmail_id"
-                " AND a.alliance_id = :alliance_id))"
-            )
-            params["alliance_id"] = alliance_id
         if npc is not None:
             clauses.append("k.zkb_is_npc = :npc")
             params["npc"] = int(npc)
@@ -211,82 +543,255 @@ class KillmailRepository:
             clauses.append("k.zkb_is_awox = :awox")
             params["awox"] = int(awox)
 
-        where = " AND ".join(clauses) if clauses else "1=1"
+        entities = [
+            (entity_type, entity_id)
+            for entity_type, entity_id in (
+                ("character", character_id),
+                ("corporation", corporation_id),
+                ("alliance", alliance_id),
+            )
+            if entity_id is not None
+        ]
+        if not entities:
+            where = " AND ".join(clauses) if clauses else "1=1"
+            return "killmails k", where, params, "k.killmail_time", "k.killmail_id"
 
-        total = self.session.execute(
-            text(f"SELECT COUNT(*) FROM killmails k WHERE {where}"), params
-        ).scalar()
+        # The first entity drives the query as a time-ordered range read of
+        # killmail_participants; any others are primary-key point lookups.
+        (entity_type, entity_id), *others = entities
+        clauses.append(f"p.entity_type = '{entity_type}' AND p.entity_id = :{entity_type}_id")
+        params[f"{entity_type}_id"] = entity_id
+        for entity_type, entity_id in others:
+            clauses.append(
+                f"EXISTS (SELECT 1 FROM killmail_participants p_{entity_type}"
+                f" WHERE p_{entity_type}.entity_type = '{entity_type}'"
+                f" AND p_{entity_type}.entity_id = :{entity_type}_id"
+                f" AND p_{entity_type}.killmail_time = p.killmail_time"
+                f" AND p_{entity_type}.killmail_id = p.killmail_id)"
+            )
+            params[f"{entity_type}_id"] = entity_id
+        source = "killmail_participants p JOIN killmails k ON k.killmail_id = p.killmail_id"
+        return source, " AND ".join(clauses), params, "p.killmail_time", "p.killmail_id"
 
-        rows = self.session.execute(
-            text(
-                f"SELECT k.* FROM killmails k WHERE {where}"
-                " ORDER BY k.killmail_time DESC LIMIT :limit OFFSET :offset"
-            ),
-            {**params, "limit": limit, "offset": offset},
-        )
+    def _count(
+        self, source: str, where: str, params: dict, strategy: CountStrategy
+    ) -> tuple[int | None, bool]:
+        if strategy == "none":
+            return None, False
 
-        kills = []
-        for r in rows:
-            row = dict(r._mapping)
-            row["zkb_labels"] = json.loads(row["zkb_labels"]) if row.get("zkb_labels") else []
-            kills.append(row)
+        if strategy == "cached":
+            key = tuple(sorted(params.items()))
+            total = totals_cache.get(key)
+            if total is None:
+                total = self._count(source, where, params, "exact")[0]
+                totals_cache.set(key, total)
+            return total, False
+
+        if strategy == "estimate":
+            if not params:
+                # InnoDB's row estimate from table statistics, no scan at all.
+                total = self.session.execute(
+                    text(
+                        "SELECT TABLE_ROWS FROM information_schema.TABLES"
+                        " WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'killmails'"
+                    )
+                ).scalar()
+                return total or 0, True
+            # Stop counting at the cap; the total is exact below it.
+            total = self.session.execute(
+                text(
+                    f"SELECT COUNT(*) FROM (SELECT 1 FROM {source} WHERE {where}"
+                    " LIMIT :count_cap) capped"
+                ),
+                {**params, "count_cap": settings.count_estimate_cap},
+            ).scalar()
+            return total, total >= settings.count_estimate_cap
 
-        return kills, total
+        total = self.session.execute(
+            text(f"SELECT COUNT(*) FROM {source} WHERE {where}"), params
+        ).scalar()
+        return total, False
 
     def get_kill(self, killmail_id: int) -> dict | None:
+        # Attackers and items are aggregated into JSON columns so the whole
+        # killmail comes back in one round trip.
         row = self.session.execute(
-            text("SELECT * FROM killmails WHERE killmail_id = :id"),
+            text(
+                f"SELECT k.*, ({_ATTACKERS_JSON}) AS attackers_json, ({_ITEMS_JSON}) AS items_json"
+                " FROM killmails k WHERE k.killmail_id = :id"
+            ),
             {"id": killmail_id},
         ).first()
 
         if row is None:
             return None
 
-        kill = dict(row._mapping)
-        kill["zkb_labels"] = json.loads(kill["zkb_labels"]) if kill.get("zkb_labels") else []
+        kill = self._detail(row)
+        attackers = json.loads(kill.pop("attackers_json") or "[]")
+        items = json.loads(kill.pop("items_json") or "[]")
+        kill["attackers"] = sorted(attackers, key=lambda a: (-a["damage_done"], a["id"]))
+        kill["items"] = self._build_item_tree(sorted(items, key=lambda i: i["id"]))
+        return kill
 
-        attackers = self.session.execute(
-            text("SELECT * FROM killmail_attackers WHERE killmail_id = :id ORDER BY damage_done DESC"),
-            {"id": killmail_id},
-        )
-        kill["attackers"] = [dict(r._mapping) for r in attackers]
+    def get_kills(self, killmail_ids: list[int]) -> list[dict]:
+        # Three set-based queries for any number of killmails. Results follow
+        # the order of killmail_ids; unknown IDs are skipped.
+        if not killmail_ids:
+            return []
+        params = {"ids": list(dict.fromkeys(killmail_ids))}
 
-        items = self.session.execute(
-            text("SELECT * FROM killmail_items WHERE killmail_id = :id"),
-            {"id": killmail_id},
-        )
-        kill["items"] = self._build_item_tree([dict(r._mapping) for r in items])
+        kills = {
+            r.killmail_id: self._detail(r)
+            for r in self.session.execute(
+                text("SELECT * FROM killmails WHERE killmail_id IN :ids").bindparams(
+                    bindparam("ids", expanding=True)
+                ),
+                params,
+            )
+        }
+        self._attach_children(kills)
+        return [kills[i] for i in params["ids"] if i in kills]
+
+    def _attach_children(self, kills: dict[int, dict]) -> None:
+        # Loads attackers and items for every killmail in `kills` with one
+        # IN query each and sets them on the killmail dicts.
+        if not kills:
+            return
+        params = {"ids": list(kills)}
+
+        attackers: dict[int, list[dict]] = {killmail_id: [] for killmail_id in kills}
+        for r in self.session.execute(
+            text(
+                "SELECT * FROM killmail_attackers WHERE killmail_id IN :ids"
+                " ORDER BY killmail_id, damage_done DESC, id"
+            ).bindparams(bindparam("ids", expanding=True)),
+            params,
+        ):
+            attackers[r.killmail_id].append(dict(r._mapping))
+
+        items: dict[int, list[dict]] = {killmail_id: [] for killmail_id in kills}
+        for r in self.session.execute(
+            text(
+                "SELECT killmail_id, id, parent_id, item_type_id, flag, quantity_destroyed,"
+                " quantity_dropped, singleton FROM killmail_items WHERE killmail_id IN :ids"
+                " ORDER BY killmail_id, id"
+            ).bindparams(bindparam("ids", expanding=True)),
+            params,
+        ):
+            item = dict(r._mapping)
+            items[item.pop("killmail_id")].append(item)
+
+        for killmail_id, kill in kills.items():
+            kill["attackers"] = attackers[killmail_id]
+            kill["items"] = self._build_item_tree(items[killmail_id])
 
+    def export_kills(
+        self,
+        *,
+        include_children: bool = False,
+        chunk_size: int = 1000,
+        **filters,
+    ) -> Iterator[list[dict]]:
+        # Streams every matching killmail, newest first, in chunks of
+        # `chunk_size`. Rows come from an unbuffered server-side cursor on a
+        # dedicated connection, so memory use does not depend on the number
+        # of rows and the session stays free for the attacker/item lookups.
+        source, where, params, time_col, id_col = self._kill_query(**filters)
+        query = text(f"SELECT k.* FROM {source} WHERE {where} ORDER BY {time_col} DESC, {id_col} DESC")
+        with self.session.get_bind().connect() as conn:
+            result = conn.execution_options(stream_results=True, max_row_buffer=chunk_size).execute(
+                query, params
+            )
+            for rows in result.partitions(chunk_size):
+                kills = {r.killmail_id: self._detail(r) for r in rows}
+                if include_children:
+                    self._attach_children(kills)
+                yield list(kills.values())
+
+    @staticmethod
+    def _detail(row) -> dict:
+        kill = dict(row._mapping)
+        kill["zkb_labels"] = json.loads(kill["zkb_labels"]) if kill.get("zkb_labels") else []
         return kill
 
-    def get_stats(self) -> dict:
+    def get_stats(self, since: datetime | None = None, until: datetime | None = None) -> dict:
+        # Reads the hourly rollups maintained on insert, so cost depends on
+        # the number of buckets in the window, not the number of kills. The
+        # window is hour-granular: it is widened to whole hours at both ends
+        # (since rounded down, until rounded up), so it covers every kill in
+        # [since, until) plus the rest of the hours at its edges.
+        clauses = []
+        params: dict = {}
+        if since is not None:
+            clauses.append("bucket >= :since")
+            params["since"] = since.replace(minute=0, second=0, microsecond=0)
+        if until is not None:
+            clauses.append("bucket < :until")
+            hour = until.replace(minute=0, second=0, microsecond=0)
+            params["until"] = hour if hour == until else hour + timedelta(hours=1)
+        window = "".join(f" AND {c}" for c in clauses)
+
         row = self.session.execute(
             text(
-                "SELECT COUNT(*) AS total_kills, COALESCE(SUM(zkb_total_value), 0) AS total_value,"
-                " SUM(zkb_is_npc) AS kills_npc, SUM(zkb_is_solo) AS kills_solo,"
-                " SUM(zkb_is_awox) AS kills_awox FROM killmails"
-            )
+                "SELECT COALESCE(SUM(kills), 0) AS total_kills,"
+                " COALESCE(SUM(total_value), 0) AS total_value,"
+                " COALESCE(SUM(kills_npc), 0) AS kills_npc,"
+                " COALESCE(SUM(kills_solo), 0) AS kills_solo,"
+                " COALESCE(SUM(kills_awox), 0) AS kills_awox"
+                f" FROM killmail_stats_hourly WHERE dimension = 'all'{window}"
+            ),
+            params,
         ).first()
 
         stats = dict(row._mapping)
+        stats["top_ships"] = self._top("ship", "ship_type_id", window, params)
+        stats["top_solar_systems"] = self._top("system", "solar_system_id", window, params)
+        stats["top_alliances"] = self._top("alliance", "alliance_id", window, params)
+        return stats
 
-        ships = self.session.execute(
+    def _top(self, dimension: str, column: str, window: str, params: dict) -> list[dict]:
+        rows = self.session.execute(
             text(
-                "SELECT victim_ship_type_id AS ship_type_id, COUNT(*) AS count"
-                " FROM killmails GROUP BY victim_ship_type_id ORDER BY count DESC LIMIT 10"
-            )
+                f"SELECT dimension_id AS {column}, SUM(kills) AS count"
+                f" FROM killmail_stats_hourly WHERE dimension = '{dimension}'{window}"
+                " GROUP BY dimension_id ORDER BY count DESC LIMIT 10"
+            ),
+            params,
         )
-        stats["top_ships"] = [dict(r._mapping) for r in ships]
+        return [dict(r._mapping) for r in rows]
 
-        systems = self.session.execute(
+    def recent_kills(self, since: datetime) -> list[dict]:
+        # Columns the in-memory hot window keeps, with each kill's attacker
+        # entities; two range scans instead of one query per killmail.
+        rows = self.session.execute(
             text(
-                "SELECT solar_system_id, COUNT(*) AS count"
-                " FROM killmails GROUP BY solar_system_id ORDER BY count DESC LIMIT 10"
-            )
+                "SELECT killmail_id, killmail_time, solar_system_id, victim_ship_type_id,"
+                " victim_character_id, victim_corporation_id, victim_alliance_id,"
+                " zkb_total_value, zkb_is_npc, zkb_is_solo, zkb_is_awox, zkb_labels"
+                " FROM killmails WHERE killmail_time >= :since ORDER BY killmail_time, killmail_id"
+            ),
+            {"since": since},
         )
-        stats["top_solar_systems"] = [dict(r._mapping) for r in systems]
+        kills = {}
+        for r in rows:
+            row = dict(r._mapping)
+            row["zkb_labels"] = json.loads(row["zkb_labels"]) if row.get("zkb_labels") else []
+            row["attackers"] = []
+            kills[row["killmail_id"]] = row
 
-        return stats
+        attackers = self.session.execute(
+            text(
+                "SELECT a.killmail_id, a.character_id, a.corporation_id, a.alliance_id"
+                " FROM killmail_attackers a JOIN killmails k ON k.killmail_id = a.killmail_id"
+                " WHERE k.killmail_time >= :since"
+            ),
+            {"since": since},
+        )
+        for r in attackers:
+            kill = kills.get(r.killmail_id)
+            if kill is not None:
+                kill["attackers"].append(dict(r._mapping))
+        return list(kills.values())
 
     @staticmethod
     def _build_item_tree(flat_items: list[dict]) -> list[dict]:
@@ -299,3 +804,25 @@ class KillmailRepository:
             else:
                 by_id[parent]["items"].append(item)
         return roots
+
+
+class AsyncKillmailRepository:
+    # Async API-facing repository. Each call runs the KillmailRepository
+    # code through AsyncSession.run_sync, so the queries go out over the
+    # async driver without tying up a worker thread, and the SQL is shared
+    # with the sync code paths.
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def list_kills(self, **kwargs) -> dict:
+        return await self.session.run_sync(lambda s: KillmailRepository(s).list_kills(**kwargs))
+
+    async def get_kill(self, killmail_id: int) -> dict | None:
+        return await self.session.run_sync(lambda s: KillmailRepository(s).get_kill(killmail_id))
+
+    async def get_kills(self, killmail_ids: list[int]) -> list[dict]:
+        return await self.session.run_sync(lambda s: KillmailRepository(s).get_kills(killmail_ids))
+
+    async def get_stats(self, since: datetime | None = None, until: datetime | None = None) -> dict:
+        return await self.session.run_sync(lambda s: KillmailRepository(s).get_stats(since, until))
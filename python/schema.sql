@@ -70,6 +70,8 @@ CREATE TABLE IF NOT EXISTS killmail_items (
     id                 BIGINT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY,
     killmail_id        BIGINT UNSIGNED NOT NULL,
     parent_id          BIGINT UNSIGNED NULL,
+    item_index         SMALLINT UNSIGNED NOT NULL DEFAULT 0,
+    parent_index       SMALLINT UNSIGNED NULL,
     item_type_id       INT UNSIGNED    NOT NULL,
     flag               SMALLINT UNSIGNED NOT NULL DEFAULT 0,
     quantity_destroyed  INT UNSIGNED    NOT NULL DEFAULT 0,
@@ -79,6 +81,43 @@ CREATE TABLE IF NOT EXISTS killmail_items (
     INDEX idx_item_killmail (killmail_id),
     INDEX idx_item_type (item_type_id),
     INDEX idx_item_parent (parent_id),
+    INDEX idx_item_local (killmail_id, item_index),
     CONSTRAINT fk_item_killmail FOREIGN KEY (killmail_id) REFERENCES killmails(killmail_id) ON DELETE CASCADE,
     CONSTRAINT fk_item_parent FOREIGN KEY (parent_id) REFERENCES killmail_items(id) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- One row per (character|corporation|alliance, killmail), victim and/or
+-- attacker, so entity filters are a range read ordered by time.
+CREATE TABLE IF NOT EXISTS killmail_participants (
+    entity_type   ENUM('character', 'corporation', 'alliance') NOT NULL,
+    entity_id     INT UNSIGNED    NOT NULL,
+    killmail_time DATETIME        NOT NULL,
+    killmail_id   BIGINT UNSIGNED NOT NULL,
+    role          SET('victim', 'attacker') NOT NULL,
+
+    PRIMARY KEY (entity_type, entity_id, killmail_time, killmail_id),
+    INDEX idx_participant_killmail (killmail_id),
+    CONSTRAINT fk_participant_killmail FOREIGN KEY (killmail_id) REFERENCES killmails(killmail_id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Hourly rollups behind GET /stats, updated in the same transaction as
+-- each insert. dimension_id is 0 for the 'all' dimension.
+CREATE TABLE IF NOT EXISTS killmail_stats_hourly (
+    dimension    ENUM('all', 'ship', 'system', 'alliance') NOT NULL,
+    dimension_id INT UNSIGNED    NOT NULL,
+    bucket       DATETIME        NOT NULL,
+    kills        INT UNSIGNED    NOT NULL DEFAULT 0,
+    total_value  DECIMAL(24,2)   NOT NULL DEFAULT 0,
+    kills_npc    INT UNSIGNED    NOT NULL DEFAULT 0,
+    kills_solo   INT UNSIGNED    NOT NULL DEFAULT 0,
+    kills_awox   INT UNSIGNED    NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (dimension, dimension_id, bucket),
+    INDEX idx_stats_bucket (dimension, bucket)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS poller_checkpoints (
+    name        VARCHAR(64)     NOT NULL PRIMARY KEY,
+    sequence_id BIGINT UNSIGNED NOT NULL,
+    updated_at  DATETIME        NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,202 @@
+import csv
+import io
+import json
+import re
+import typing
+from datetime import datetime
+from decimal import Decimal
+from types import UnionType
+from typing import Any, Callable, Sequence
+
+from pydantic import BaseModel
+
+from models import KillmailDetail, KillmailListResponse, KillmailSummary
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Renders response bodies straight from repository rows, producing the same
+# bytes as validating them through the response models and letting FastAPI
+# encode the result. Rows come from our own schema, so only the conversions
+# pydantic would apply are kept: TINYINT flags become booleans, DECIMAL
+# becomes its string form, DECIMAL read into float fields becomes a float.
+
+Converter = Callable[[Any], Any]
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+def _optional(convert: Converter) -> Converter:
+    return lambda value: None if value is None else convert(value)
+
+
+def _decimal(value: Any) -> str:
+    return str(value if isinstance(value, Decimal) else Decimal(value))
+
+
+def _converter(annotation: Any) -> Converter:
+    args = typing.get_args(annotation)
+    if typing.get_origin(annotation) in (typing.Union, UnionType) and type(None) in args:
+        (inner,) = (a for a in args if a is not type(None))
+        convert = _converter(inner)
+        return _identity if convert is _identity else _optional(convert)
+    if typing.get_origin(annotation) is list:
+        (item,) = args
+        if isinstance(item, type) and issubclass(item, BaseModel):
+            return lambda values: [render(item, v) for v in values]
+        return _identity
+    if annotation is bool:
+        return bool
+    if annotation is float:
+        return float
+    if annotation is Decimal:
+        return _decimal
+    return _identity
+
+
+_plans: dict[type[BaseModel], list[tuple[str, Converter, Any]]] = {}
+
+
+def _plan(model: type[BaseModel]) -> list[tuple[str, Converter, Any]]:
+    plan = _plans.get(model)
+    if plan is None:
+        plan = _plans[model] = []
+        for name, field in model.model_fields.items():
+            default = None if field.is_required() else field.get_default(call_default_factory=True)
+            plan.append((name, _converter(field.annotation), default))
+    return plan
+
+
+def render(model: type[BaseModel], row: dict) -> dict:
+    # Field order follows the model, extra keys are dropped like pydantic does.
+    return {
+        name: convert(row[name]) if name in row else default
+        for name, convert, default in _plan(model)
+    }
+
+
+def _summary_plan(columns: Sequence[str]) -> list[tuple[str, int, Converter]]:
+    return [(name, columns.index(name), convert) for name, convert, _ in _plan(KillmailSummary)]
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+# orjson writes floats that Python's repr puts in exponent form differently:
+# 1e16 for 1e+16, -0.000015 for -1.5e-05. Bodies with a number like that
+# are encoded again with json, so the bytes (and ETags) do not depend on
+# whether orjson is installed. The hints below also occur inside strings
+# (hex hashes), so a hit only counts if it sits in a number token. Both
+# searches have a literal prefix and run at C speed; an alternation or a
+# leading character class costs more than the orjson encode it guards.
+_EXPONENT_HINT = re.compile(rb"e[-123]")
+_SMALL_DECIMAL_HINT = b"0.0000"
+_NUMBER_BYTES = frozenset(b"0123456789.-")
+_VALUE_START = frozenset(b":,[")
+
+
+def _in_number(body: bytes, at: int, digits_before: bool) -> bool:
+    start = at
+    while start and body[start - 1] in _NUMBER_BYTES:
+        start -= 1
+    if digits_before and start == at:
+        return False
+    return not start or body[start - 1] in _VALUE_START
+
+
+def _orjson_only_float(body: bytes) -> bool:
+    for match in _EXPONENT_HINT.finditer(body):
+        if _in_number(body, match.start(), digits_before=True):
+            return True
+    at = body.find(_SMALL_DECIMAL_HINT)
+    while at != -1:
+        if _in_number(body, at, digits_before=False):
+            return True
+        at = body.find(_SMALL_DECIMAL_HINT, at + 1)
+    return False
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        body = orjson.dumps(content)
+        if not _orjson_only_float(body):
+            return body
+    # Same settings as starlette's JSONResponse.
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=_default
+    ).encode("utf-8")
+
+
+def render_kill_list(result: dict, columns: Sequence[str]) -> bytes:
+    # `result["kills"]` holds tuples in `columns` order, as returned by
+    # KillmailRepository.list_kills(raw=True).
+    plan = _summary_plan(columns)
+    kills = [{name: convert(row[i]) for name, i, convert in plan} for row in result["kills"]]
+    body = render(KillmailListResponse, {**result, "kills": []})
+    body["kills"] = kills
+    return dumps(body)
+
+
+def render_kill_detail(kill: dict) -> bytes:
+    return dumps(render(KillmailDetail, kill))
+
+
+def render_kill_details(kills: list[dict]) -> bytes:
+    return dumps([render(KillmailDetail, kill) for kill in kills])
+
+
+# ── Export ──────────────────────────────────────────────────────────
+
+_CHILDREN = ("attackers", "items")
+EXPORT_COLUMNS = tuple(name for name in KillmailDetail.model_fields if name not in _CHILDREN)
+
+
+def _export_row(kill: dict, include_children: bool) -> dict:
+    row = render(KillmailDetail, kill)
+    if not include_children:
+        for name in _CHILDREN:
+            del row[name]
+    return row
+
+
+def render_ndjson(kills: list[dict], include_children: bool = False) -> bytes:
+    return b"".join(dumps(_export_row(kill, include_children)) + b"\n" for kill in kills)
+
+
+def _csv_cell(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, list):
+        return dumps(value).decode()
+    return value
+
+
+def csv_header(include_children: bool = False) -> bytes:
+    return render_csv_rows([EXPORT_COLUMNS + (_CHILDREN if include_children else ())])
+
+
+def render_csv(kills: list[dict], include_children: bool = False) -> bytes:
+    # Labels, attackers and items are nested, so they are written as JSON
+    # inside their cells.
+    columns = EXPORT_COLUMNS + (_CHILDREN if include_children else ())
+    return render_csv_rows(
+        [_csv_cell(row[c]) for c in columns]
+        for row in (_export_row(kill, include_children) for kill in kills)
+    )
+
+
+def render_csv_rows(rows) -> bytes:
+    buf = io.StringIO()
+    csv.writer(buf).writerows(rows)
+    return buf.getvalue().encode("utf-8")
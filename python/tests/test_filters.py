@@ -0,0 +1,89 @@
+import asyncio
+import random
+
+from bench.synthetic import killmail
+from filters import FilterPipeline
+from filters.level1 import AwoxFilter, NpcFilter, SecurityFilter, SoloFilter
+from filters.level2 import (
+    AllianceFilter,
+    CharacterFilter,
+    CorporationFilter,
+    MaxValueFilter,
+    MinValueFilter,
+    RegionFilter,
+    ShipTypeFilter,
+    SolarSystemFilter,
+)
+
+KILLMAILS = [killmail(i, random.Random(i)) for i in range(500)]
+
+
+def _entity_filters(mode: str) -> list:
+    attacker = KILLMAILS[0]["esi"]["attackers"][0]
+    return [
+        CharacterFilter([attacker["character_id"]], mode=mode),
+        CorporationFilter([attacker["corporation_id"]], mode=mode),
+        AllianceFilter([attacker.get("alliance_id", 0)], mode=mode),
+        ShipTypeFilter([587, 670], mode=mode),
+        SolarSystemFilter(range(30000000, 30001000), mode=mode),
+        RegionFilter([10000002, 10000060], mode=mode),
+    ]
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_checks_match_filters():
+    filters = [
+        NpcFilter(exclude=True), NpcFilter(), SoloFilter(exclude=True), AwoxFilter(exclude=True),
+        SecurityFilter(["nullsec", "w-space"]), MinValueFilter(10_000_000), MaxValueFilter(1_000_000_000),
+        *_entity_filters("include"), *_entity_filters("exclude"),
+    ]
+    for f in filters:
+        compiled = FilterPipeline().add_level1(f).compile()
+        for km in KILLMAILS:
+            assert compiled.evaluate(km) == f.filter(km), type(f).__name__
+
+
+def test_compiled_pipelines_agree_with_evaluate():
+    pipeline = (
+        FilterPipeline()
+        .add_level1(NpcFilter(exclude=True))
+        .add_level1(SecurityFilter(["lowsec", "nullsec", "w-space"]))
+        .add_level2(MinValueFilter(1_000_000))
+        .add_level2(_entity_filters("exclude")[2])
+    )
+    compiled = pipeline.compile()
+    adaptive = pipeline.compile(adaptive=True)
+    adaptive.REORDER_EVERY = 50
+    for km in KILLMAILS * 3:
+        expected = pipeline.evaluate(km)
+        assert compiled.evaluate(km) == expected
+        assert adaptive.evaluate(km) == expected
+        assert _run(adaptive.evaluate_async(km)) == expected
+
+
+def test_adaptive_counts_runs_across_reorders():
+    filters = [NpcFilter(exclude=True), SecurityFilter(["nullsec"]), MinValueFilter(50_000_000)]
+    runs = {type(f).__name__: 0 for f in filters}
+    rejections = dict(runs)
+    for f in filters:
+        def check(facts, f=f, check=f.check):
+            name = type(f).__name__
+            runs[name] += 1
+            accepted = check(facts)
+            rejections[name] += not accepted
+            return accepted
+        f.check = check
+
+    adaptive = FilterPipeline().add_level1(filters[0]).add_level1(filters[1]).add_level2(filters[2])
+    adaptive = adaptive.compile(adaptive=True)
+    adaptive.REORDER_EVERY = 70
+    for km in KILLMAILS:
+        adaptive.evaluate(km)
+
+    assert [s.filter for s in adaptive._stages][:2] != filters[:2]  # reordered at least once
+    for count in adaptive.stage_counts():
+        assert count["runs"] == runs[count["filter"]]
+        assert count["rejections"] == rejections[count["filter"]]
@@ -0,0 +1,86 @@
+import asyncio
+
+import pymysql
+from sqlalchemy.exc import OperationalError
+
+from checkpoint import MySQLCheckpointStore
+from ingest import IngestPipeline, is_transient
+
+
+class MemoryCheckpoint(MySQLCheckpointStore):
+    def __init__(self):
+        super().__init__(session_factory=None)
+        self.written: list[int] = []
+
+    def _read(self) -> int:
+        return 0
+
+    def _write(self, sequence_id: int) -> None:
+        self.written.append(sequence_id)
+
+
+class StubPoller:
+    def __init__(self, last_sequence_id: int):
+        self.last_sequence_id = last_sequence_id
+        self.fetched = 0
+
+
+def mysql_error(code: int) -> OperationalError:
+    return OperationalError("INSERT", {}, pymysql.err.OperationalError(code, "error"))
+
+
+def make_pipeline(save, last_sequence_id: int) -> IngestPipeline:
+    pipeline = IngestPipeline(StubPoller(last_sequence_id), None, save, MemoryCheckpoint())
+    pipeline.retry_delay = 0
+    return pipeline
+
+
+def test_transient_errors_are_classified_by_code():
+    assert is_transient(mysql_error(2006))
+    assert is_transient(mysql_error(1213))
+    assert not is_transient(mysql_error(1292))
+    assert not is_transient(mysql_error(3140))
+    assert not is_transient(ValueError("bad killmail"))
+
+
+def test_cursor_never_passes_an_unsaved_killmail():
+    # Sequence 12 cannot be saved, so its batch falls back to saving one
+    # killmail at a time; a crash after any of those saves must resume at
+    # or before every killmail that has not been saved (or dropped) yet.
+    batch = [({"killmail_id": s}, s) for s in range(10, 15)]
+    saved: set[int] = set()
+    cursors: list[tuple[int, set[int]]] = []
+
+    def save(items, checkpoint):
+        if any(sequence_id == 12 for _, sequence_id in items):
+            raise mysql_error(1292)
+        saved.update(sequence_id for _, sequence_id in items)
+        cursors.append((checkpoint[1], set(saved)))
+
+    pipeline = make_pipeline(save, last_sequence_id=20)
+    pipeline._in_flight = {s for _, s in batch}
+    asyncio.run(pipeline._persist(batch))
+
+    assert saved == {10, 11, 13, 14}
+    for cursor, stored in cursors:
+        unsaved = {s for _, s in batch if s not in stored and s != 12}
+        assert all(cursor < s for s in unsaved), (cursor, unsaved)
+    assert pipeline.checkpoint.committed == 20
+    assert not pipeline._in_flight
+
+
+def test_transient_errors_are_retried():
+    attempts = []
+
+    def save(items, checkpoint):
+        attempts.append(len(items))
+        if len(attempts) == 1:
+            raise mysql_error(2013)
+
+    pipeline = make_pipeline(save, last_sequence_id=2)
+    batch = [({"killmail_id": 1}, 1), ({"killmail_id": 2}, 2)]
+    pipeline._in_flight = {1, 2}
+    asyncio.run(pipeline._persist(batch))
+
+    assert attempts == [2, 2]
+    assert pipeline.checkpoint.committed == 2
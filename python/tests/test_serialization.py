@@ -0,0 +1,47 @@
+import json
+import random
+from datetime import datetime
+
+import pytest
+
+import serialization
+from serialization import dumps
+
+EXTREME_FLOATS = [
+    1e16, -1e16, 1e22, 1.2345678901234568e16, 1e308, 5e-324,
+    -0.000015, 2.5e-05, 1.5e-07, 9.999e-05, 0.0001, -0.0, 0.0, 999999999999999.9,
+]
+
+
+def _starlette(content) -> bytes:
+    # What JSONResponse renders for the same content.
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+@pytest.fixture(params=["orjson", "json"])
+def encoder(request, monkeypatch):
+    if request.param == "json":
+        monkeypatch.setattr(serialization, "orjson", None)
+    elif serialization.orjson is None:
+        pytest.skip("orjson is not installed")
+    return request.param
+
+
+def test_extreme_floats_match_starlette(encoder):
+    for value in EXTREME_FLOATS:
+        for content in (value, [value], {"victim_pos_x": value, "name": "ok"}, [1, {"a": [value]}]):
+            assert dumps(content) == _starlette(content), (encoder, value)
+
+
+def test_random_floats_match_starlette(encoder):
+    rng = random.Random(0)
+    values = [rng.uniform(-1, 1) * 10 ** rng.randint(-12, 22) for _ in range(5000)]
+    row = {"security_status": 0.5, "values": values}
+    assert dumps(row) == _starlette(row)
+    for value in values:
+        assert dumps({"v": value}) == _starlette({"v": value})
+
+
+def test_strings_that_look_like_exponents_round_trip(encoder):
+    content = {"hash": "3e9a0000", "labels": [":1e5", "0.00001"], "time": datetime(2024, 1, 2, 3, 4, 5)}
+    assert json.loads(dumps(content)) == {**content, "time": "2024-01-02T03:04:05"}
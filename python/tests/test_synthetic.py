@@ -0,0 +1,12 @@
+import json
+import random
+
+from bench.synthetic import fleet_fight, killmail
+
+
+def test_same_seed_gives_same_bytes():
+    for sequence_id in (1, 500, 123_456):
+        first = json.dumps(killmail(sequence_id, random.Random(7), labels=None))
+        second = json.dumps(killmail(sequence_id, random.Random(7), labels=None))
+        assert first == second
+    assert json.dumps(fleet_fight(42)) == json.dumps(fleet_fight(42))